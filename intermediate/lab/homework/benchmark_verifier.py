@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+Terraform Workshop Verifier Benchmark
+
+Generates synthetic trainee workspaces, from the minimal exercise solution up
+to main.tf files with thousands of resources and modules plus a whole cohort
+of trainee directories, and times the verifier on them. terraform is replaced
+by a fake local binary, so the runs are deterministic and need no network.
+
+Usage:
+    python benchmark_verifier.py [--sizes minimal,large] [--repeat N]
+    python benchmark_verifier.py --save baseline.json
+    python benchmark_verifier.py --compare baseline.json [--threshold 0.2]
+
+The timings are written as JSON. With --compare, every metric whose median is
+more than the threshold slower than in the baseline is reported as a
+regression and the script exits with 1.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from workshop_verifier import (  # noqa: E402
+    FAILURE,
+    INFO,
+    SUCCESS,
+    WARNING,
+    RecordingReporter,
+    ResultCache,
+    TerraformVerifier,
+    load_rules,
+    run_batch,
+)
+
+# Synthetic resources and modules appended to the solution's main.tf
+SIZES = {
+    "minimal": (0, 0),
+    "small": (50, 10),
+    "medium": (500, 100),
+    "large": (2000, 500),
+    "huge": (5000, 1000),
+}
+DEFAULT_SIZES = "minimal,small,medium,large"
+DEFAULT_COHORT = 24
+DEFAULT_THRESHOLD = 0.2
+# Regressions smaller than this are noise, whatever the relative change
+MIN_DELTA = 0.0005
+
+SOLUTION = {
+    "main.tf": '''terraform {
+  cloud {
+    hostname     = "tfe.axa-cloud.com"
+    organization = "TFE-Training"
+
+    workspaces {
+      name = "benchmark"
+    }
+  }
+}
+
+provider "aws" {
+  region = "eu-central-1"
+  default_tags {
+    tags = {
+      "tfe-training" = "true"
+      "owner"        = var.prefix
+    }
+  }
+}
+
+data "aws_caller_identity" "current" {}
+
+data "aws_vpc" "selected" {
+  filter {
+    name   = "tag:tfe-training"
+    values = ["true"]
+  }
+}
+
+data "aws_subnets" "selected" {
+  filter {
+    name   = "vpc-id"
+    values = [data.aws_vpc.selected.id]
+  }
+}
+
+locals {
+  permanent_prefix = "tfe-training"
+  final_prefix     = "${local.permanent_prefix}-${var.env}-${var.prefix}"
+}
+
+resource "aws_sns_topic" "sns_topic" {
+  for_each = toset(["sns-1", "sns-2", "sns-3"])
+  name     = each.key == "sns-2" ? "${local.final_prefix}-sns-topic-ternary" : "${local.final_prefix}-${each.key}-sns-topic"
+}
+
+import {
+  to = aws_sqs_queue.imported_queue
+  id = "https://sqs.eu-central-1.amazonaws.com/${data.aws_caller_identity.current.account_id}/${local.final_prefix}-mock-import"
+}
+
+resource "aws_sqs_queue" "imported_queue" {
+  name = "${local.final_prefix}-mock-import"
+}
+
+module "s3_bucket" {
+  source  = "tfe.axa-cloud.com/Global-Module-Sharing/s3-bucket-synced/aws"
+  version = "5.2.0"
+
+  bucket = "${local.final_prefix}-bucket"
+  acl    = "private"
+
+  control_object_ownership = true
+  object_ownership         = "ObjectWriter"
+
+  versioning = {
+    enabled = true
+  }
+}
+
+resource "aws_s3_object" "s3_object" {
+  bucket  = module.s3_bucket.s3_bucket_id
+  key     = "s3_object.txt"
+  content = file("${path.module}/s3_object.txt")
+}
+
+ephemeral "aws_secretsmanager_random_password" "db_password" {
+  password_length     = 16
+  exclude_punctuation = true
+}
+
+resource "aws_secretsmanager_secret" "db_password" {
+  name = "${local.final_prefix}-db_password"
+}
+
+resource "aws_secretsmanager_secret_version" "db_password" {
+  secret_id                = aws_secretsmanager_secret.db_password.id
+  secret_string_wo         = ephemeral.aws_secretsmanager_random_password.db_password.random_password
+  secret_string_wo_version = 1
+}
+
+ephemeral "aws_secretsmanager_secret_version" "db_password" {
+  secret_id = aws_secretsmanager_secret_version.db_password.secret_id
+}
+
+resource "aws_security_group" "db_sg" {
+  name   = "${local.final_prefix}-db-sg"
+  vpc_id = data.aws_vpc.selected.id
+
+  ingress {
+    from_port   = 5432
+    to_port     = 5432
+    protocol    = "tcp"
+    cidr_blocks = [data.aws_vpc.selected.cidr_block]
+  }
+}
+
+resource "aws_db_subnet_group" "db" {
+  name       = "${local.final_prefix}-db-subnet-group"
+  subnet_ids = data.aws_subnets.selected.ids
+}
+
+resource "aws_db_instance" "db" {
+  identifier             = "${local.final_prefix}-db"
+  engine                 = "postgres"
+  instance_class         = "db.t4g.micro"
+  allocated_storage      = 5
+  username               = "example"
+  password_wo            = ephemeral.aws_secretsmanager_secret_version.db_password.secret_string
+  password_wo_version    = 1
+  skip_final_snapshot    = true
+  db_subnet_group_name   = aws_db_subnet_group.db.name
+  vpc_security_group_ids = [aws_security_group.db_sg.id]
+}
+''',
+    "outputs.tf": '''output "vpc_id" {
+  description = "The ID of the VPC to use for the network resources."
+  value       = data.aws_vpc.selected.id
+}
+
+output "subnet_ids" {
+  description = "The IDs of the subnets to use for the network resources."
+  value       = data.aws_subnets.selected.ids
+}
+
+output "sns_topic_arns" {
+  description = "The ARNs of the SNS topics created for the training."
+  value       = [for topic in aws_sns_topic.sns_topic : topic.arn]
+}
+''',
+    "variables.tf": '''variable "prefix" {
+  type        = string
+  description = "A prefix to use for all resources created in this module."
+  default     = "benchmark"
+}
+
+variable "env" {
+  type        = string
+  description = "The environment for which this module is being used."
+
+  validation {
+    condition     = contains(["dev", "test", "prod"], var.env)
+    error_message = "env must be one of dev, test or prod."
+  }
+}
+''',
+    "versions.tf": '''terraform {
+  required_providers {
+    aws = {
+      source  = "hashicorp/aws"
+      version = "~> 6.4"
+    }
+  }
+}
+''',
+    "terraform.tfvars": '''env    = "dev"
+prefix = "benchmark"
+''',
+    "s3_object.txt": "hello\n",
+}
+
+RESOURCE = '''
+resource "aws_sqs_queue" "bench_{i}" {{
+  name                       = "${{local.final_prefix}}-bench-{i}"
+  visibility_timeout_seconds = {timeout}
+  tags = {{
+    "index" = "{i}"
+  }}
+
+  redrive_policy = jsonencode({{
+    deadLetterTargetArn = aws_sqs_queue.imported_queue.arn
+    maxReceiveCount     = 4
+  }})
+}}
+'''
+
+MODULE = '''
+module "bench_{i}" {{
+  source  = "tfe.axa-cloud.com/Global-Module-Sharing/s3-bucket-synced/aws"
+  version = "5.2.0"
+
+  bucket = "${{local.final_prefix}}-bench-{i}"
+
+  versioning = {{
+    enabled = {enabled}
+  }}
+}}
+'''
+
+# Stands in for terraform: sleeps like a process start-up and always succeeds
+FAKE_TERRAFORM = '''#!/bin/sh
+sleep {delay}
+case "$1" in
+  validate) echo "Success! The configuration is valid." ;;
+  version) echo '{{"terraform_version":"1.9.0"}}' ;;
+esac
+exit 0
+'''
+
+
+def generate_workspace(path, resources=0, modules=0, drop=()):
+    """Write the exercise solution plus synthetic resources and modules to path.
+
+    Files listed in drop are left out to model a trainee who is not done yet.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    for filename, content in SOLUTION.items():
+        if filename in drop:
+            continue
+        if filename == "main.tf":
+            content += "".join(RESOURCE.format(i=i, timeout=30 + i % 60) for i in range(resources))
+            content += "".join(MODULE.format(i=i, enabled=str(i % 2 == 0).lower()) for i in range(modules))
+        (path / filename).write_text(content)
+    return path
+
+
+def generate_cohort(root, trainees=DEFAULT_COHORT, resources=50, modules=10):
+    """Write a cohort tree where every third trainee is still missing some files."""
+    unfinished = [("outputs.tf",), ("terraform.tfvars", "s3_object.txt"), ()]
+    return [
+        generate_workspace(Path(root) / f"trainee-{n:03d}", resources, modules, drop=unfinished[n % 3])
+        for n in range(trainees)
+    ]
+
+
+def install_fake_terraform(bin_dir, delay=0.05):
+    """Put a fake terraform first on the PATH of this process and its children."""
+    bin_dir = Path(bin_dir)
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    terraform = bin_dir / "terraform"
+    terraform.write_text(FAKE_TERRAFORM.format(delay=delay))
+    terraform.chmod(0o755)
+    os.environ["PATH"] = f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+    return terraform
+
+
+def measure(function, repeat):
+    """Call function repeat times and return the timings in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return {"min": min(timings), "median": statistics.median(timings), "runs": len(timings)}
+
+
+def benchmark_workspace(workspace, repeat, cache_dir):
+    """Time construction, parsing, every exercise and run_all_checks on one workspace."""
+    rules = load_rules()
+    results = {}
+
+    def construct():
+        return TerraformVerifier(workspace, rules=rules, reporters=[RecordingReporter()])
+
+    results["construct"] = measure(construct, repeat)
+
+    def parse():
+        verifier = construct()
+        for filename in rules.inputs:
+            verifier.document(filename)
+
+    results["parse"] = measure(parse, repeat)
+
+    # Exercises run against parsed documents, so their timings show the checks only
+    for exercise in rules.exercises:
+        verifiers = []
+        for _ in range(repeat):
+            verifier = construct()
+            for filename in exercise.inputs:
+                verifier.document(filename)
+            verifiers.append(verifier)
+        results[f"exercise/{exercise.name}"] = measure(lambda: verifiers.pop().run_exercise(exercise), repeat)
+
+    results["run_all_checks"] = measure(lambda: construct().run_all_checks(), repeat)
+
+    cache = ResultCache(cache_dir)
+    TerraformVerifier(workspace, cache=cache, rules=rules, reporters=[RecordingReporter()]).run_all_checks()
+    results["run_all_checks/cached"] = measure(
+        lambda: TerraformVerifier(workspace, cache=ResultCache(cache_dir), rules=rules, reporters=[RecordingReporter()]).run_all_checks(),
+        repeat,
+    )
+    return results
+
+
+def benchmark_cohort(directories, repeat, workers):
+    """Time verifying a whole cohort with the batch mode."""
+    return {
+        "run_batch": measure(
+            lambda: run_batch(directories, workers=workers, reporters=[RecordingReporter()], cache=None),
+            repeat,
+        )
+    }
+
+
+def run_benchmarks(sizes, repeat, cohort, workers, delay):
+    with tempfile.TemporaryDirectory(prefix="verifier-bench-") as tmp:
+        tmp = Path(tmp)
+        install_fake_terraform(tmp / "bin", delay)
+        results = {}
+        for size in sizes:
+            resources, modules = SIZES[size]
+            workspace = generate_workspace(tmp / "workspaces" / size, resources, modules)
+            print(f"{INFO} {size}: {resources} resources, {modules} modules", file=sys.stderr)
+            for name, timing in benchmark_workspace(workspace, repeat, tmp / "cache" / size).items():
+                results[f"{size}/{name}"] = timing
+        if cohort:
+            print(f"{INFO} cohort: {cohort} trainees", file=sys.stderr)
+            directories = generate_cohort(tmp / "cohort", cohort)
+            for name, timing in benchmark_cohort(directories, max(1, repeat // 2), workers).items():
+                results[f"cohort-{cohort}/{name}"] = timing
+        shutil.rmtree(tmp / "bin")
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "terraform_delay": delay,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Return (name, baseline, current, change) for every metric in both runs, plus the regressions."""
+    rows, regressions = [], []
+    for name, timing in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before, after = baseline["results"][name]["median"], timing["median"]
+        change = (after - before) / before if before else 0.0
+        rows.append((name, before, after, change))
+        if change > threshold and after - before > MIN_DELTA:
+            regressions.append(name)
+    return rows, regressions
+
+
+def print_results(report, rows=None, regressions=()):
+    print("\n=====================================================================================")
+    print(f"{INFO} Benchmark Results (median of {report['meta']['repeat']} runs)")
+    print("=====================================================================================")
+    if rows is None:
+        for name, timing in report["results"].items():
+            print(f"{timing['median']*1000:>10.2f} ms  {name}")
+        return
+    print(f"{'Baseline':>10}  {'Current':>10}  {'Change':>8}  Name")
+    for name, before, after, change in rows:
+        status = FAILURE if name in regressions else SUCCESS
+        print(f"{before*1000:>8.2f}ms  {after*1000:>8.2f}ms  {change*100:>+7.1f}%  {status}{name}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Terraform workshop verifier on synthetic workspaces.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"Comma separated workspace sizes out of {', '.join(SIZES)} (default: {DEFAULT_SIZES})")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement, the median is reported (default: 5)")
+    parser.add_argument("--cohort", type=int, default=DEFAULT_COHORT, help=f"Trainees in the synthetic cohort, 0 to skip it (default: {DEFAULT_COHORT})")
+    parser.add_argument("--workers", type=int, default=None, help="Batch workers for the cohort benchmark (default: CPU count)")
+    parser.add_argument("--terraform-delay", type=float, default=0.05, help="Seconds the fake terraform binary takes per call (default: 0.05)")
+    parser.add_argument("--save", metavar="PATH", help="Write the results as JSON to PATH, e.g. to use them as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="Compare against a baseline JSON file written with --save")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help=f"Relative slowdown counted as a regression (default: {DEFAULT_THRESHOLD})")
+    args = parser.parse_args(argv)
+    unknown = [size for size in args.sizes.split(",") if size not in SIZES]
+    if unknown:
+        parser.error(f"unknown size(s): {', '.join(unknown)}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_benchmarks(args.sizes.split(","), args.repeat, args.cohort, args.workers, args.terraform_delay)
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\n{INFO} Results written to {args.save}")
+
+    if not args.compare:
+        print_results(report)
+        return 0
+
+    baseline = json.loads(Path(args.compare).read_text())
+    rows, regressions = compare(report, baseline, args.threshold)
+    print_results(report, rows, regressions)
+    if regressions:
+        print(f"\n{FAILURE} {len(regressions)} metric(s) more than {args.threshold*100:.0f}% slower than the baseline")
+        return 1
+    if not rows:
+        print(f"\n{WARNING} No metrics in common with the baseline")
+        return 0
+    print(f"\n{SUCCESS} No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,12 +4,63 @@ Terraform Workshop Verification Script
 
 This script verifies the completion of exercises in the Terraform workshop.
 It checks for the presence and correctness of various Terraform resources and configurations.
+The exercises and their checks are defined in workshop_rules.json next to this script,
+together with local equivalents of the Sentinel policies in lab/setup/policies.
+
+Usage:
+    python workshop_verifier.py [directory]
+    python workshop_verifier.py --watch [directory]
+    python workshop_verifier.py --batch <root directory or glob> [--workers N]
+    python workshop_verifier.py --serve <port> [--batch <root directory or glob>]
+
+Formatting is only checked and reported as a diff, pass --fix-format to let
+terraform fmt rewrite the files. Check results and terraform output are cached
+per content hash, use --no-cache to force a full run. Results are printed as
+text by default, --format jsonl streams one JSON record per check instead and
+--junit <file> additionally writes a JUnit XML report for CI systems.
+--profile prints where the time went and --trace <file> writes the same
+timings for chrome://tracing.
+
+Workspaces without a .terraform directory are validated against a terraform
+init shared by all workspaces with the same providers and modules. Pass
+--offline to install providers from its filesystem mirror only.
 """
 
+import argparse
+import asyncio
+import codecs
+import concurrent.futures
+import contextlib
+import difflib
+import functools
+import glob
+import hashlib
+import json
+import mmap
 import os
 import re
+import shutil
+import stat
 import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+from xml.etree import ElementTree
+
+try:
+    import fcntl
+except ImportError:  # Windows, shared inits are not serialised across processes there
+    fcntl = None
+
+try:
+    import resource
+except ImportError:  # Windows, the profile shows no CPU time of terraform there
+    resource = None
 
 # Constants
 SUCCESS = f"✅ "
@@ -17,358 +68,2237 @@ FAILURE = f"❌ "
 WARNING = f"⚠️ "
 INFO = f"ℹ️ "
 
+# Characters that can change the nesting state while scanning HCL
+_EXPRESSION_STOP = re.compile(r'["<#/(){}\[\]\n,]')
+_STRING_STOP = re.compile(r'[\\"$%\n]')
+_IDENTIFIER = re.compile(r'[A-Za-z_][\w-]*')
+_HEREDOC = re.compile(r'<<-?([A-Za-z_]\w*)[ \t]*\n')
+_WHITESPACE = re.compile(r'\s+')
+
+
+class HCLBlock:
+    """A parsed HCL block with its raw attribute expressions and nested blocks."""
+
+    def __init__(self, block_type, labels=()):
+        self.type = block_type
+        self.labels = tuple(labels)
+        self.attributes = {}
+        self.blocks = []
+
+    @property
+    def exists(self):
+        return self.type is not None
+
+    def children(self, block_type):
+        """Return the nested blocks of the given type."""
+        return [block for block in self.blocks if block.type == block_type]
+
+    def child(self, block_type):
+        """Return the first nested block of the given type or a missing block."""
+        return next(iter(self.children(block_type)), MISSING_BLOCK)
+
+    def attribute(self, name, default=""):
+        return self.attributes.get(name, default)
+
+    def string(self, name):
+        """Return the literal value of a string attribute or None."""
+        return hcl_string(self.attributes.get(name, ""))
+
+
+MISSING_BLOCK = HCLBlock(None)
+
+
+class HCLDocument:
+    """An HCL file parsed once into blocks indexed by (block type, labels)."""
+
+    def __init__(self, text):
+        self.body = HCLBlock("")
+        self.index = {}
+        _HCLParser(text).parse_body(self.body)
+        for block in self.body.blocks:
+            # Register every label prefix so partial lookups stay O(1)
+            for size in range(len(block.labels) + 1):
+                self.index.setdefault((block.type,) + block.labels[:size], []).append(block)
+
+    @property
+    def attributes(self):
+        return self.body.attributes
+
+    def blocks(self, block_type, *labels):
+        """Return all top-level blocks matching the type and leading labels."""
+        return self.index.get((block_type,) + labels, [])
+
+    def first(self, block_type, *labels):
+        """Return the first matching top-level block or a missing block."""
+        return next(iter(self.blocks(block_type, *labels)), MISSING_BLOCK)
+
+    def nested(self, block_type, *path):
+        """Return the first block reached by following nested block types."""
+        candidates = self.blocks(block_type)
+        for nested_type in path:
+            candidates = [child for block in candidates for child in block.children(nested_type)]
+        return next(iter(candidates), MISSING_BLOCK)
+
+    def merged_attributes(self, block_type):
+        """Return the attributes of all blocks of a type, e.g. every locals block."""
+        merged = {}
+        for block in self.blocks(block_type):
+            merged.update(block.attributes)
+        return merged
+
+
+class _HCLParser:
+    """Single-pass, error tolerant scanner for the HCL native syntax."""
+
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+
+    def parse_body(self, block):
+        text = self.text
+        while True:
+            self._skip_space()
+            if self.pos >= len(text):
+                return
+            if text[self.pos] == "}":
+                self.pos += 1
+                return
+
+            match = _IDENTIFIER.match(text, self.pos)
+            if not match:
+                self._skip_line()
+                continue
+            name = match.group()
+            self.pos = match.end()
+            self._skip_space(newlines=False)
+
+            if text.startswith("=", self.pos) and not text.startswith("==", self.pos):
+                self.pos += 1
+                block.attributes[name] = self.read_expression()
+                continue
+
+            labels = []
+            while self.pos < len(text):
+                char = text[self.pos]
+                if char == '"':
+                    start = self.pos
+                    self._skip_string()
+                    labels.append(text[start + 1:self.pos - 1])
+                elif char == "{":
+                    self.pos += 1
+                    nested = HCLBlock(name, labels)
+                    self.parse_body(nested)
+                    block.blocks.append(nested)
+                    break
+                else:
+                    match = _IDENTIFIER.match(text, self.pos)
+                    if not match:
+                        self._skip_line()
+                        break
+                    labels.append(match.group())
+                    self.pos = match.end()
+                self._skip_space(newlines=False)
+
+    def parse_object(self):
+        """Parse the items of an object constructor into a key -> expression dict."""
+        text = self.text
+        items = {}
+        while True:
+            self._skip_space()
+            while text.startswith(",", self.pos):
+                self.pos += 1
+                self._skip_space()
+            if self.pos >= len(text):
+                return items
+            if text[self.pos] == '"':
+                start = self.pos
+                self._skip_string()
+                key = text[start + 1:self.pos - 1]
+            else:
+                match = _IDENTIFIER.match(text, self.pos)
+                if not match:
+                    self._skip_line()
+                    continue
+                key = match.group()
+                self.pos = match.end()
+            self._skip_space(newlines=False)
+            if self.pos < len(text) and text[self.pos] in "=:":
+                self.pos += 1
+                items[key] = self.read_expression(in_object=True)
+            else:
+                self._skip_line()
+
+    def read_expression(self, in_object=False):
+        """Read an attribute expression up to the end of its line at depth 0."""
+        text = self.text
+        start = self.pos
+        end = None
+        depth = 0
+        while True:
+            match = _EXPRESSION_STOP.search(text, self.pos)
+            if not match:
+                self.pos = len(text)
+                break
+            self.pos = match.start()
+            char = match.group()
+            if char == '"':
+                self._skip_string()
+            elif char == "<" and _HEREDOC.match(text, self.pos):
+                self._skip_heredoc()
+            elif char == "#" or text.startswith("//", self.pos):
+                if depth == 0:
+                    end = self.pos
+                self._skip_line()
+            elif text.startswith("/*", self.pos):
+                close = text.find("*/", self.pos + 2)
+                self.pos = len(text) if close == -1 else close + 2
+            elif char in "([{":
+                depth += 1
+                self.pos += 1
+            elif char in ")]}":
+                if depth == 0:
+                    break
+                depth -= 1
+                self.pos += 1
+            elif char == "\n" and depth == 0:
+                break
+            elif char == "," and depth == 0 and in_object:
+                break
+            else:
+                self.pos += 1
+            if end is not None:
+                break
+        return text[start:self.pos if end is None else end].strip()
+
+    def _skip_string(self):
+        """Skip a quoted template, including nested ${...} interpolations."""
+        text = self.text
+        self.pos += 1
+        while True:
+            match = _STRING_STOP.search(text, self.pos)
+            if not match or match.group() == "\n":
+                # Unterminated string, stop at the end of the line
+                self.pos = match.start() if match else len(text)
+                return
+            self.pos = match.start()
+            char = match.group()
+            if char == "\\":
+                self.pos += 2
+            elif char == '"':
+                self.pos += 1
+                return
+            elif text.startswith("{", self.pos + 1) and not text.startswith(char * 2, self.pos - 1):
+                self.pos += 2
+                depth = 1
+                while depth and self.pos < len(text):
+                    char = text[self.pos]
+                    if char == '"':
+                        self._skip_string()
+                        continue
+                    if char == "{":
+                        depth += 1
+                    elif char == "}":
+                        depth -= 1
+                    self.pos += 1
+            else:
+                self.pos += 1
+
+    def _skip_heredoc(self):
+        match = _HEREDOC.match(self.text, self.pos)
+        terminator = re.compile(rf'^[ \t]*{match.group(1)}[ \t]*$', re.MULTILINE)
+        close = terminator.search(self.text, match.end())
+        self.pos = len(self.text) if not close else close.end()
+
+    def _skip_space(self, newlines=True):
+        text = self.text
+        while self.pos < len(text):
+            char = text[self.pos]
+            if char == "\n" and not newlines:
+                return
+            if char.isspace():
+                self.pos += 1
+            elif char == "#" or text.startswith("//", self.pos):
+                self._skip_line()
+            elif text.startswith("/*", self.pos):
+                close = text.find("*/", self.pos + 2)
+                self.pos = len(text) if close == -1 else close + 2
+            else:
+                return
+
+    def _skip_line(self):
+        newline = self.text.find("\n", self.pos)
+        self.pos = len(self.text) if newline == -1 else newline
+
+
+def hcl_string(expression):
+    """Return the content of a plain string literal expression or None."""
+    if len(expression) >= 2 and expression[0] == expression[-1] == '"' and "${" not in expression:
+        return expression[1:-1]
+    return None
+
+
+def hcl_object(expression):
+    """Return the items of an object constructor expression as a dict."""
+    expression = expression.strip()
+    if not (expression.startswith("{") and expression.endswith("}")):
+        return {}
+    return _HCLParser(expression[1:-1]).parse_object()
+
+
+def normalize(expression):
+    """Remove all whitespace from an expression for layout independent comparison."""
+    return _WHITESPACE.sub("", expression)
+
+
+_ATTRIBUTE_LINE = re.compile(r'^([A-Za-z_][\w-]*|"[^"\n]*")\s*=(?![=>])\s*(.*)$')
+_HEREDOC_START = re.compile(r'<<-?([A-Za-z_]\w*)\s*$')
+
+
+def _line_brackets(line, in_comment=False):
+    """Scan one line of HCL outside of strings.
+
+    Returns the net bracket change, the terminator of a heredoc opened on the
+    line, whether a /* comment is still open and whether the line has a comment.
+    """
+    net = 0
+    scanner = _HCLParser(line)
+    while scanner.pos < len(line):
+        if in_comment:
+            close = line.find("*/", scanner.pos)
+            if close == -1:
+                return net, None, True, True
+            scanner.pos = close + 2
+            in_comment = False
+            continue
+        char = line[scanner.pos]
+        if char == '"':
+            scanner._skip_string()
+            continue
+        if char == "#" or line.startswith("//", scanner.pos):
+            return net, None, False, True
+        if line.startswith("/*", scanner.pos):
+            in_comment = True
+            scanner.pos += 2
+            continue
+        heredoc = _HEREDOC_START.match(line, scanner.pos)
+        if heredoc:
+            return net, heredoc.group(1), False, False
+        if char in "([{":
+            net += 1
+        elif char in ")]}":
+            net -= 1
+        scanner.pos += 1
+    return net, None, in_comment, False
+
+
+def format_hcl(text):
+    """Approximate terraform fmt: two space indentation per bracket level and aligned '='.
+
+    Heredocs and multi-line comments are kept verbatim. This is used when no
+    terraform binary is available, so it only needs to agree with terraform fmt
+    on the layouts trainees commonly write.
+    """
+    lines = []
+    indents = []
+    heredoc = None
+    in_comment = False
+    for raw in text.split("\n"):
+        if heredoc is not None:
+            lines.append(raw)
+            if raw.strip() == heredoc:
+                heredoc = None
+            continue
+        if in_comment:
+            _, _, in_comment, _ = _line_brackets(raw, in_comment=True)
+            lines.append(raw)
+            continue
+        stripped = raw.strip()
+        if not stripped:
+            lines.append("")
+            continue
+        net, heredoc, in_comment, has_comment = _line_brackets(stripped)
+        if has_comment:
+            # Comments are kept byte for byte, including trailing whitespace
+            stripped = raw.lstrip()
+        level = len(indents)
+        if net > 0:
+            indents.append(net)
+        elif net < 0:
+            # Same bookkeeping as hclwrite: a line closes whole indentation levels
+            closed = -net
+            while closed > 0 and indents:
+                if closed >= indents[-1]:
+                    closed -= indents.pop()
+                else:
+                    indents[-1] -= closed
+                    closed = 0
+            level = len(indents)
+        lines.append((level, stripped, net > 0 or heredoc is not None))
+
+    # Align '=' of consecutive single line attributes at the same level
+    formatted = []
+    group = []
+
+    def flush():
+        width = max((len(match.group(1)) for _, match in group), default=0)
+        for level, match in group:
+            value = match.group(2)
+            formatted.append("  " * level + match.group(1).ljust(width) + (" = " + value if value else " ="))
+        group.clear()
+
+    for line in lines:
+        # Attributes whose value spans several lines are not aligned
+        match = _ATTRIBUTE_LINE.match(line[1]) if isinstance(line, tuple) and not line[2] else None
+        if match and group and group[-1][0] != line[0]:
+            flush()
+        if match:
+            group.append((line[0], match))
+            continue
+        flush()
+        formatted.append("  " * line[0] + line[1] if isinstance(line, tuple) else line)
+    flush()
+    return "\n".join(formatted)
+
+
+def format_diff(filename, text):
+    """Return a unified diff between a file and its formatted version, empty if it is formatted."""
+    formatted = format_hcl(text)
+    if formatted == text:
+        return ""
+    return "".join(difflib.unified_diff(
+        text.splitlines(keepends=True),
+        formatted.splitlines(keepends=True),
+        fromfile=f"old/{filename}",
+        tofile=f"new/{filename}",
+    ))
+
+
+def parse_fmt_diff(stdout, filenames):
+    """Split the output of terraform fmt -check -diff into a diff per file."""
+    diffs = {}
+    current = None
+    for line in stdout.splitlines(keepends=True):
+        header = re.match(r"--- old/(.+)", line)
+        if header:
+            current = header.group(1).strip()
+            diffs[current] = ""
+        elif line.strip() in filenames:
+            # terraform lists each unformatted file before its diff
+            current = None
+            diffs.setdefault(line.strip(), "")
+            continue
+        if current is not None:
+            diffs[current] += line
+    return diffs
+
+
+# Seconds before a hanging terraform subprocess (e.g. a stuck provider plugin) is killed
+DEFAULT_TIMEOUT = 300
+
+DEFAULT_RULES_FILE = Path(__file__).with_name("workshop_rules.json")
+
+
+class AttributeMatcher:
+    """Conditions on one attribute expression, compiled from a rule's ``attributes`` entry."""
+
+    KEYS = {"equals", "one_of", "normalized", "contains", "pattern", "normalize", "default"}
+
+    def __init__(self, spec):
+        self.equals = spec.get("equals")
+        self.one_of = spec.get("one_of")
+        normalized = spec.get("normalized")
+        self.normalized = [normalized] if isinstance(normalized, str) else normalized
+        self.contains = spec.get("contains", [])
+        self.pattern = re.compile(spec["pattern"]) if "pattern" in spec else None
+        self.normalize = spec.get("normalize", False)
+        self.default = spec.get("default")
+
+    def matches(self, expression):
+        if expression is None:
+            if self.default is None:
+                return False
+            expression = json.dumps(self.default)
+        if self.normalize:
+            expression = normalize(expression)
+        literal = hcl_string(expression)
+        if self.equals is not None and literal != self.equals:
+            return False
+        if self.one_of is not None and literal not in self.one_of:
+            return False
+        if self.normalized is not None and normalize(expression) not in self.normalized:
+            return False
+        if not all(part in expression for part in self.contains):
+            return False
+        return self.pattern is None or bool(self.pattern.search(expression))
+
+
+class Rule:
+    """A single reported check, e.g. "S3 bucket module found".
+
+    A rule is one of:
+      - ``exists``: a file must exist in the workspace
+      - ``search``: a regular expression must match somewhere in ``file``
+      - ``any_of``: at least one of the nested rules must pass
+      - a block query: ``file`` must contain a ``block`` (type and leading
+        labels), optionally descending into nested block types (``path``),
+        for which all ``attributes`` match. Without ``block`` the attributes
+        are looked up at the top level of the file, e.g. in terraform.tfvars.
+    Attribute names may use dots to look into object values, e.g. "tags.owner".
+    Specs are checked when the registry is loaded, so a typo in the JSON file
+    fails loudly instead of silently weakening the rule.
+    """
+
+    KEYS = {"message", "exists", "file", "search", "any_of", "block", "path", "attributes"}
+
+    def __init__(self, spec, registry, exercise=""):
+        self._validate(spec, exercise)
+        self.message = spec.get("message", "")
+        self.exists = spec.get("exists")
+        self.file = spec.get("file")
+        self.block = tuple(spec.get("block", ()))
+        self.path = tuple(spec.get("path", ()))
+        self.attributes = [(name.split("."), AttributeMatcher(matcher)) for name, matcher in spec.get("attributes", {}).items()]
+        self.any_of = [Rule(sub, registry, exercise) for sub in spec.get("any_of", [])]
+        self.search = registry.add_search(spec["search"]) if "search" in spec else None
+
+    @classmethod
+    def _validate(cls, spec, exercise):
+        """Raise ValueError naming the exercise and the rule if a spec cannot be evaluated."""
+        def fail(problem):
+            raise ValueError(f"{exercise}: check {spec.get('message', '')!r} {problem}")
+
+        if not isinstance(spec, dict):
+            fail("is not an object")
+        unknown = set(spec) - cls.KEYS
+        if unknown:
+            fail(f"has unknown key(s): {', '.join(sorted(unknown))}")
+        for name, matcher in spec.get("attributes", {}).items():
+            unknown = set(matcher) - AttributeMatcher.KEYS
+            if unknown:
+                fail(f"has unknown key(s) for attribute {name!r}: {', '.join(sorted(unknown))}")
+        if "exists" in spec or "any_of" in spec:
+            return
+        if "file" not in spec:
+            fail("needs one of exists, any_of or file")
+        if "search" not in spec and "block" not in spec and ("path" in spec or not spec.get("attributes")):
+            fail("needs a search, a block or top-level attributes")
+
+    @property
+    def inputs(self):
+        files = {name for name in (self.exists, self.file) if name}
+        return files.union(*(rule.inputs for rule in self.any_of))
+
+    def evaluate(self, verifier):
+        if self.exists:
+            return verifier.file_exists(self.exists)
+        if self.any_of:
+            return any(rule.evaluate(verifier) for rule in self.any_of)
+        if self.search:
+            return verifier.search(self.file, self.search)
+
+        document = verifier.document(self.file)
+        candidates = document.blocks(*self.block) if self.block else [document.body]
+        for nested_type in self.path:
+            candidates = [child for block in candidates for child in block.children(nested_type)]
+        return any(
+            all(matcher.matches(self._resolve(block, name)) for name, matcher in self.attributes)
+            for block in candidates
+        )
+
+    @staticmethod
+    def _resolve(block, name):
+        expression = block.attributes.get(name[0])
+        for key in name[1:]:
+            if expression is None:
+                return None
+            expression = hcl_object(expression).get(key)
+        return expression
+
+
+class Exercise:
+    """An exercise with its compiled rules and the files they read."""
+
+    def __init__(self, spec, registry):
+        self.name = spec["name"]
+        self.title = spec.get("title", f"Checking {self.name}")
+        self.rules = [Rule(rule, registry, self.name) for rule in spec["checks"]]
+        self.inputs = sorted(set().union(*(rule.inputs for rule in self.rules)))
+
+
+_REFERENCE = re.compile(r'(var|local)\.([A-Za-z_][\w-]*)')
+
+
+class PolicyTarget:
+    """The blocks a policy applies to and the attribute every one of them must satisfy."""
+
+    def __init__(self, spec):
+        self.block = tuple(spec["block"])
+        self.where = [(name, AttributeMatcher(matcher)) for name, matcher in spec.get("where", {}).items()]
+        self.attribute = spec["attribute"]
+        self.optional = spec.get("optional", False)
+        self.matcher = AttributeMatcher(spec.get("matcher", {}))
+
+
+class Policy:
+    """A Sentinel policy of the lab evaluated statically against the configuration.
+
+    Like the policy's ``all`` rule, every block matching a target has to
+    satisfy it. References to variables and locals are resolved from the
+    workspace, values only known during a plan are reported as unknown.
+    """
+
+    def __init__(self, spec):
+        self.name = spec["name"]
+        self.source = spec.get("source")
+        self.enforcement = spec.get("enforcement", "advisory")
+        self.message = spec["message"]
+        self.targets = [PolicyTarget(target) for target in spec["targets"]]
+
+    def evaluate(self, verifier):
+        """Return the violations and the values that could not be checked offline."""
+        violations, unknown = [], []
+        for document in verifier.configuration():
+            for target in self.targets:
+                for block in document.blocks(*target.block):
+                    if not all(matcher.matches(block.attributes.get(name)) for name, matcher in target.where):
+                        continue
+                    address = block_address(block)
+                    expression = block.attributes.get(target.attribute)
+                    if expression is None:
+                        if not target.optional:
+                            violations.append(f"{address}: {target.attribute} is not set")
+                        continue
+                    value = verifier.resolve(expression)
+                    if value is None or hcl_string(value) is None:
+                        unknown.append(f"{address}: {target.attribute} = {expression}")
+                    elif not target.matcher.matches(value):
+                        violations.append(f"{address}: {target.attribute} = {value}")
+        return violations, unknown
+
+
+def block_address(block):
+    """Return the Terraform address of a top-level block, e.g. module.s3_bucket."""
+    if block.type == "resource":
+        return ".".join(block.labels)
+    return ".".join((block.type,) + block.labels)
+
+
+class RuleRegistry:
+    """Exercise rules and policies loaded from a JSON file and compiled once per process."""
+
+    def __init__(self, spec, digest=""):
+        self.digest = digest
+        self.patterns = {}
+        self.exercises = [Exercise(exercise, self) for exercise in spec["exercises"]]
+        self.policies = [Policy(policy) for policy in spec.get("policies", [])]
+
+    def add_search(self, pattern):
+        """Compile the pattern of a search rule and return the name it is looked up by."""
+        name = f"rule{len(self.patterns)}"
+        self.patterns[name] = re.compile(pattern, re.MULTILINE)
+        return name
+
+    @property
+    def inputs(self):
+        return sorted(set().union(*(exercise.inputs for exercise in self.exercises)))
+
+    @classmethod
+    def from_file(cls, path):
+        data = Path(path).read_bytes()
+        return cls(json.loads(data), hashlib.sha256(data).hexdigest())
+
+
+@functools.lru_cache(maxsize=None)
+def load_rules(path=DEFAULT_RULES_FILE):
+    return RuleRegistry.from_file(path)
+
+
+# Exercise files, also available as verifier attributes for older callers
+FILE_ATTRIBUTES = {
+    "main.tf": "main_tf",
+    "variables.tf": "variables_tf",
+    "outputs.tf": "outputs_tf",
+    "versions.tf": "versions_tf",
+    "terraform.tfvars": "tfvars",
+}
+
+DEFAULT_MAX_FILE_BYTES = 16 * 1024 * 1024
+MMAP_THRESHOLD = 1024 * 1024
+
+
+class WorkspaceFiles:
+    """Lazy access to the files of a workspace.
+
+    The directory is listed and every file is stat'ed at most once, content is
+    only read on first access. Files from ``MMAP_THRESHOLD`` on are memory
+    mapped instead of being read into an intermediate buffer, files above
+    ``max_bytes`` are not loaded at all. Problems are kept as diagnostics
+    instead of being raised, a file that cannot be read is treated as empty.
+    The static checks, the event loop and the shared init use the same
+    instance, so access is serialised.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_FILE_BYTES, profiler=None):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.profiler = profiler
+        self.diagnostics = {}
+        self._listing = None
+        self._stats = {}
+        self._texts = {}
+        self._digests = {}
+        self._lock = threading.RLock()
+
+    def names(self, *suffixes):
+        """Return the sorted names of the regular files in the directory, optionally by suffix."""
+        with self._lock:
+            if self._listing is None:
+                listing = []
+                try:
+                    with os.scandir(self.directory) as entries:
+                        for entry in entries:
+                            try:
+                                if entry.is_file():
+                                    self._stats[entry.name] = entry.stat()
+                                    listing.append(entry.name)
+                            except OSError as e:
+                                self.diagnostics[entry.name] = f"cannot be accessed: {e.strerror or e}"
+                except OSError as e:
+                    self.diagnostics["."] = f"cannot be listed: {e.strerror or e}"
+                self._listing = sorted(listing)
+            listing = self._listing
+        return [name for name in listing if not suffixes or name.endswith(suffixes)]
+
+    def stat(self, filename):
+        """Return the stat result of a file, None if it does not exist."""
+        with self._lock:
+            if filename not in self._stats:
+                try:
+                    self._stats[filename] = os.stat(self.directory / filename)
+                except FileNotFoundError:
+                    self._stats[filename] = None
+                except OSError as e:
+                    self._stats[filename] = None
+                    self.diagnostics[filename] = f"cannot be accessed: {e.strerror or e}"
+            return self._stats[filename]
+
+    def exists(self, filename):
+        return self.stat(filename) is not None
+
+    def oversized(self, filename):
+        """Return whether a file is above the size limit, the checks see it as empty then."""
+        info = self.stat(filename)
+        return info is not None and stat.S_ISREG(info.st_mode) and info.st_size > self.max_bytes
+
+    def text(self, filename):
+        """Return the content of a file with universal newlines, "" if it is missing or unreadable."""
+        with self._lock:
+            text = self._texts.get(filename)
+            if text is None:
+                text = ""
+                with self._open(filename) as data:
+                    if data is not None:
+                        try:
+                            text = codecs.decode(data, "utf-8")
+                        except UnicodeDecodeError as e:
+                            self.diagnostics[filename] = f"is not valid UTF-8 ({e.reason} at byte {e.start})"
+                            text = codecs.decode(data, "utf-8", "replace")
+                if "\r" in text:
+                    text = text.replace("\r\n", "\n").replace("\r", "\n")
+                self._texts[filename] = text
+            return text
+
+    def digest(self, filename):
+        """Hash the raw content of a file without decoding it.
+
+        Files above the size limit are not loaded for the checks, but
+        terraform still reads them, so they are hashed in chunks.
+        """
+        with self._lock:
+            digest = self._digests.get(filename)
+            if digest is None:
+                if self.oversized(filename):
+                    digest = self._digests[filename] = self._stream_digest(filename, self.stat(filename))
+                else:
+                    with self._open(filename) as data:
+                        digest = self._digests[filename] = hashlib.sha256(b"missing" if data is None else data).digest()
+            return digest
+
+    def invalidate(self, filename):
+        """Forget everything known about a file, e.g. after it changed."""
+        with self._lock:
+            self._stats.pop(filename, None)
+            self._texts.pop(filename, None)
+            self._digests.pop(filename, None)
+            self.diagnostics.pop(filename, None)
+            self._listing = None
+
+    def _stream_digest(self, filename, info):
+        """Hash a file above the size limit without loading it as a whole."""
+        self.diagnostics[filename] = f"skipped, {info.st_size} bytes is above the limit of {self.max_bytes} bytes"
+        digest = hashlib.sha256()
+        try:
+            with open(self.directory / filename, "rb") as f:
+                for chunk in iter(functools.partial(f.read, MMAP_THRESHOLD), b""):
+                    digest.update(chunk)
+        except OSError as e:
+            self.diagnostics[filename] = f"cannot be read: {e.strerror or e}"
+            return hashlib.sha256(b"missing").digest()
+        return digest.digest()
+
+    @contextlib.contextmanager
+    def _open(self, filename):
+        """Yield the content of a file as bytes or a memory map, None if it cannot be used."""
+        info = self.stat(filename)
+        if info is None or not stat.S_ISREG(info.st_mode):
+            yield None
+            return
+        if info.st_size > self.max_bytes:
+            self.diagnostics[filename] = f"skipped, {info.st_size} bytes is above the limit of {self.max_bytes} bytes"
+            yield None
+            return
+        span = self.profiler.span(filename, "read") if self.profiler else contextlib.nullcontext()
+        try:
+            with span, open(self.directory / filename, "rb") as f:
+                if info.st_size < MMAP_THRESHOLD:
+                    data = f.read()
+                else:
+                    # Large files are decoded and hashed straight from the mapping
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            self.diagnostics[filename] = f"cannot be read: {getattr(e, 'strerror', None) or e}"
+            yield None
+            return
+        try:
+            yield data
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "workshop-verifier"
+
+
+@functools.lru_cache(maxsize=None)
+def _terraform_fingerprint():
+    """Identify the terraform binary on the PATH by location, size and modification time."""
+    terraform = shutil.which("terraform")
+    if not terraform:
+        return ""
+    stat = os.stat(terraform)
+    return f"{terraform}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+@functools.lru_cache(maxsize=None)
+def _verifier_fingerprint():
+    """Identify this script and the terraform binary so upgrades invalidate the cache."""
+    digest = hashlib.sha256(Path(__file__).read_bytes())
+    digest.update(_terraform_fingerprint().encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """On-disk cache of check results keyed by a hash of their inputs.
+
+    Entries are small JSON files. Entries older than ``max_age`` seconds are
+    dropped and the least recently used ones are evicted once the cache grows
+    beyond ``max_bytes``.
+    """
+
+    def __init__(self, directory=None, max_bytes=50 * 1024 * 1024, max_age=7 * 24 * 3600):
+        self.directory = Path(directory) if directory else default_cache_dir()
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.writes = 0
+
+    @staticmethod
+    def key(*parts):
+        digest = hashlib.sha256(_verifier_fingerprint().encode())
+        for part in parts:
+            digest.update(b"\0" + str(part).encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if time.time() - path.stat().st_mtime > self.max_age:
+                return None
+            with open(path, "r") as f:
+                value = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first so parallel graders never read partial entries
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(value, f)
+            os.replace(tmp, path)
+            self.writes += 1
+        except OSError:
+            pass
+
+    def prune(self):
+        """Evict expired entries, then the least recently used until under the size limit."""
+        now = time.time()
+        entries = []
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+                if now - stat.st_mtime > self.max_age:
+                    path.unlink()
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, path))
+            except OSError:
+                continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            total -= size
+
+
+class PluginCache:
+    """Provider plugins and modules shared by all workspaces for terraform validate.
+
+    Workspaces the trainee did not initialise are validated against a
+    backend-less ``terraform init`` that runs once per unique set of provider
+    requirements, lock file and module calls, and is then reused by every
+    workspace with the same set. Providers are installed through
+    TF_PLUGIN_CACHE_DIR and a filesystem mirror, so with ``offline`` nothing
+    is downloaded as long as the mirror has them.
+    """
+
+    def __init__(self, directory=None, offline=False, timeout=DEFAULT_TIMEOUT):
+        # terraform runs inside the init and view directories, so every path it gets has to be absolute
+        self.directory = (Path(directory) if directory else default_cache_dir() / "terraform").resolve()
+        self.offline = offline
+        self.timeout = timeout
+        self.plugins = self.directory / "plugins"
+        self.mirror = self.directory / "mirror"
+        self.inits = self.directory / "inits"
+        self._ready = set()
+
+    def environment(self, data_dir):
+        """Return the environment for terraform commands using a shared init."""
+        return dict(
+            os.environ,
+            TF_PLUGIN_CACHE_DIR=str(self.plugins),
+            TF_CLI_CONFIG_FILE=str(self._cli_config()),
+            TF_DATA_DIR=str(data_dir),
+            TF_IN_AUTOMATION="1",
+            TF_INPUT="0",
+        )
+
+    def _cli_config(self):
+        """Write the CLI configuration installing providers from the mirror first."""
+        path = self.directory / ("offline.tfrc" if self.offline else "online.tfrc")
+        if not path.exists():
+            self.plugins.mkdir(parents=True, exist_ok=True)
+            self.mirror.mkdir(parents=True, exist_ok=True)
+            lines = ["provider_installation {", "  filesystem_mirror {", f"    path = {json.dumps(str(self.mirror))}", "  }"]
+            if not self.offline:
+                lines.append("  direct {}")
+            lines.append("}")
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(tmp, path)
+        return path
+
+    @staticmethod
+    def init_config(documents):
+        """Return a configuration with only the provider requirements and module calls of a workspace.
+
+        Returns None if a module is loaded from a local path, those workspaces
+        have to be initialised on their own. Also returns None for a block
+        missing its labels, validating in place reports terraform's own error.
+        """
+        providers, implicit, modules = {}, set(), {}
+        for document in documents:
+            for block_type in ("provider", "resource", "data", "ephemeral", "module"):
+                if any(not block.labels for block in document.blocks(block_type)):
+                    return None
+            for block in document.blocks("terraform"):
+                for requirements in block.children("required_providers"):
+                    providers.update(requirements.attributes)
+            for block in document.blocks("provider"):
+                implicit.add(block.labels[0])
+            for block_type in ("resource", "data", "ephemeral"):
+                for block in document.blocks(block_type):
+                    implicit.add(block.labels[0].split("_")[0])
+            for block in document.blocks("module"):
+                modules[block.labels[0]] = block
+
+        lines = ["terraform {", "  required_providers {"]
+        lines += [f"    {name} = {value}" for name, value in sorted(providers.items())]
+        lines += ["  }", "}"]
+        lines += [f'\nprovider "{name}" {{}}' for name in sorted(implicit - set(providers))]
+        for name, block in sorted(modules.items()):
+            source = block.string("source")
+            if source is None or source.startswith((".", "/")):
+                return None
+            lines += ["", f'module "{name}" {{', f"  source = {block.attribute('source')}"]
+            if "version" in block.attributes:
+                lines.append(f"  version = {block.attribute('version')}")
+            lines.append("}")
+        return "\n".join(lines) + "\n"
+
+    def prepare(self, directory, documents):
+        """Return the shared init directory for a workspace, running terraform init the first time."""
+        config = self.init_config(documents)
+        if config is None:
+            return None
+        try:
+            lock = (Path(directory) / ".terraform.lock.hcl").read_text()
+        except OSError:
+            lock = ""
+        digest = hashlib.sha256(_terraform_fingerprint().encode())
+        digest.update(config.encode() + b"\0" + lock.encode())
+        key = digest.hexdigest()
+        init_dir = self.inits / key
+        if key in self._ready:
+            return init_dir
+
+        with self._locked(self.inits / f"{key}.lock"):
+            if not (init_dir / "ready").exists():
+                self._init(init_dir, config, lock)
+        self._ready.add(key)
+        return init_dir
+
+    @contextlib.contextmanager
+    def _locked(self, path):
+        """Serialise inits of the same set across batch workers."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            yield
+
+    def _init(self, init_dir, config, lock):
+        # Start from scratch, a previous init may have failed halfway
+        shutil.rmtree(init_dir, ignore_errors=True)
+        init_dir.mkdir(parents=True)
+        (init_dir / "main.tf").write_text(config)
+        if lock:
+            (init_dir / ".terraform.lock.hcl").write_text(lock)
+
+        result = self._terraform(init_dir, ["init", "-backend=false", "-input=false", "-no-color"])
+        if result.returncode != 0:
+            raise RuntimeError(f"Shared terraform init failed:\n{result.stderr or result.stdout}")
+        if not self.offline:
+            # Fill the mirror so later inits of other sets work without downloads,
+            # a failure only costs those inits a download
+            self._terraform(init_dir, ["providers", "mirror", str(self.mirror)])
+        (init_dir / "ready").write_text(config)
+
+    def _terraform(self, init_dir, command):
+        try:
+            return subprocess.run(
+                ["terraform"] + command,
+                cwd=init_dir,
+                env=self.environment(init_dir / ".terraform"),
+                capture_output=True,
+                text=True,
+                timeout=self.timeout,
+                check=False
+            )
+        except subprocess.TimeoutExpired:
+            raise RuntimeError(f"terraform {' '.join(command)} timed out after {self.timeout} seconds")
+
+    @contextlib.contextmanager
+    def workspace_view(self, directory, init_dir):
+        """Yield a directory linking the workspace files next to the shared lock file.
+
+        The workspace itself is left untouched.
+        """
+        view = Path(tempfile.mkdtemp(prefix="validate-", dir=self.directory))
+        try:
+            for entry in Path(directory).iterdir():
+                if entry.name in (".terraform", ".terraform.lock.hcl"):
+                    continue
+                try:
+                    os.symlink(entry.resolve(), view / entry.name, target_is_directory=entry.is_dir())
+                except OSError:
+                    # Symlinks may need extra privileges on Windows
+                    if entry.is_dir():
+                        shutil.copytree(entry, view / entry.name)
+                    else:
+                        shutil.copy2(entry, view / entry.name)
+            if (init_dir / ".terraform.lock.hcl").exists():
+                shutil.copy2(init_dir / ".terraform.lock.hcl", view / ".terraform.lock.hcl")
+            yield view
+        finally:
+            shutil.rmtree(view, ignore_errors=True)
+
+
+class Profiler:
+    """Record wall and CPU time of verifier phases, checks, file reads and subprocesses.
+
+    CPU time is measured per thread. Spans around terraform subprocesses
+    (``children``) report the CPU time of the processes reaped since the
+    last such span ended instead, which is the subprocess itself as long as
+    every subprocess runs inside one.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans = []
+        self._children_cpu = self._reaped_cpu()
+        self._children_lock = threading.Lock()
+
+    @staticmethod
+    def _reaped_cpu():
+        if resource is None:
+            return 0.0
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return usage.ru_utime + usage.ru_stime
+
+    @contextlib.contextmanager
+    def span(self, name, category, children=False, **args):
+        start, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start
+            if children:
+                with self._children_lock:
+                    reaped, self._children_cpu = self._children_cpu, self._reaped_cpu()
+                cpu = self._children_cpu - reaped
+            else:
+                cpu = time.thread_time() - cpu
+            self.spans.append({
+                "name": name,
+                "category": category,
+                "start": start,
+                "wall": wall,
+                "cpu": cpu,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            })
+
+    def merge(self, spans):
+        """Add spans recorded in another process, e.g. a batch worker.
+
+        The start times share the monotonic clock of the machine, so the
+        workers line up with each other in the trace.
+        """
+        self.spans.extend(spans)
+
+    def table(self):
+        """Return the spans aggregated per name, slowest first."""
+        totals = {}
+        for span in self.spans:
+            total = totals.setdefault((span["category"], span["name"]), {"count": 0, "wall": 0.0, "cpu": 0.0, "max": 0.0})
+            total["count"] += 1
+            total["wall"] += span["wall"]
+            total["cpu"] += span["cpu"]
+            total["max"] = max(total["max"], span["wall"])
+        return sorted(((category, name, total) for (category, name), total in totals.items()),
+                      key=lambda row: row[2]["wall"], reverse=True)
+
+    def print_table(self, stream=None, limit=None):
+        def show(line):
+            print(line, file=stream or sys.stdout)
+
+        show("\n=====================================================================================")
+        show(f"{INFO} Profile")
+        show("=====================================================================================")
+        show(f"{'Wall ms':>10} {'CPU ms':>10} {'Max ms':>10} {'Count':>6}  {'Category':<10}  Name")
+        for category, name, total in self.table()[:limit]:
+            show(f"{total['wall']*1000:>10.2f} {total['cpu']*1000:>10.2f} {total['max']*1000:>10.2f} {total['count']:>6}  {category:<10}  {name}")
+
+    def write_trace(self, path):
+        """Write the spans in the Chrome trace-event format (chrome://tracing, Perfetto)."""
+        events = [{
+            "name": span["name"],
+            "cat": span["category"],
+            "ph": "X",
+            "ts": (span["start"] - self.origin) * 1e6,
+            "dur": span["wall"] * 1e6,
+            "pid": span["pid"],
+            "tid": span["tid"],
+            "args": {"cpu_ms": round(span["cpu"] * 1000, 3), **span["args"]},
+        } for span in self.spans]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+class TextReporter:
+    """Render result records as the human readable report.
+
+    With summary_only, only the cohort summary of a batch is printed.
+    """
+
+    def __init__(self, stream=None, batch=False, summary_only=False):
+        self.stream = stream
+        self.batch = batch
+        self.summary_only = summary_only
+        self._exercise = None
+        self._format_started = False
+
+    def _print(self, *lines):
+        for line in lines:
+            print(line, file=self.stream or sys.stdout)
+
+    def emit(self, record):
+        if self.summary_only and record["type"] != "cohort":
+            return
+        handler = getattr(self, f"_{record['type']}", None)
+        if handler:
+            handler(record)
+
+    def close(self):
+        pass
+
+    def _start(self, record):
+        self._exercise = None
+        self._format_started = False
+        if self.batch:
+            self._print(f"\n{INFO} Trainee: {Path(record['workspace']).name}")
+        self._print(f"\n{INFO} Starting Terraform Workshop Verification...",
+                    "=====================================================================================")
+
+    def _check(self, record):
+        if record["exercise"] != self._exercise:
+            self._exercise = record["exercise"]
+            self._print(f"\n{INFO} {record['title']}...",
+                        "-------------------------------------------------------------------------------------")
+        self._print(f"{SUCCESS if record['passed'] else FAILURE} {record['check']}")
+
+    def _policy(self, record):
+        if self._exercise != "policies":
+            self._exercise = "policies"
+            self._print(f"\n{INFO} Checking Sentinel policies...",
+                        "-------------------------------------------------------------------------------------")
+        if record["passed"]:
+            self._print(f"{SUCCESS} {record['policy']}: {record['message']}")
+        else:
+            icon = FAILURE if record["enforcement"] == "hard-mandatory" else WARNING
+            self._print(f"{icon} {record['policy']} ({record['enforcement']}): {record['message']}")
+            self._print(*(f"    {violation}" for violation in record["violations"]))
+        if record["unknown"]:
+            self._print(f"{INFO} {record['policy']}: only known during a plan, not checked:")
+            self._print(*(f"    {value}" for value in record["unknown"]))
+
+    def _format(self, record):
+        if not self._format_started:
+            self._format_started = True
+            title = "Running terraform fmt" if record["mode"] == "fix" else "Checking formatting (terraform fmt -check)"
+            self._print(f"\n{INFO} {title}...",
+                        "-------------------------------------------------------------------------------------")
+            if record["mode"] == "builtin":
+                self._print(f"{INFO} terraform not found, using the built-in formatting check")
+        if record["mode"] == "fix":
+            if record["error"] is None:
+                self._print(f"{SUCCESS} Terraform files formattted")
+            else:
+                self._print(f"{FAILURE} Terraform formatting failed", record["error"])
+        elif record["error"] is not None:
+            self._print(f"{FAILURE} Formatting check failed", record["error"])
+        elif record["formatted"]:
+            self._print(f"{SUCCESS} {record['file']} is formatted")
+        else:
+            self._print(f"{FAILURE} {record['file']} is not formatted, run 'terraform fmt' to fix it")
+            if record["diff"]:
+                self._print(record["diff"].rstrip())
+
+    def _watching(self, record):
+        self._print(f"\n{INFO} Watching {record['directory']} for changes (Ctrl+C to stop)...")
+
+    def _changed(self, record):
+        self._exercise = None
+        self._print(f"\n{INFO} Changed: {', '.join(record['files'])}")
+
+    def _progress(self, record):
+        self._print(f"\n{INFO} Progress: {record['completed']}/{record['total']} exercises completed")
+
+    def _stopped(self, record):
+        self._print(f"\n{INFO} Stopped watching")
+
+    def _diagnostic(self, record):
+        if self._exercise != "diagnostics":
+            self._exercise = "diagnostics"
+            self._print(f"\n{INFO} Workspace diagnostics...",
+                        "-------------------------------------------------------------------------------------")
+        name = f"{record['file']} " if record["file"] else ""
+        self._print(f"{WARNING} {name}{record['message']}")
+
+    def _validate(self, record):
+        self._print(f"\n{INFO} Running terraform validate...",
+                    "-------------------------------------------------------------------------------------")
+        if record["valid"]:
+            self._print(f"{SUCCESS} Terraform configuration is valid")
+        else:
+            self._print(f"{FAILURE} Terraform configuration is invalid:", record["output"])
+
+    def _summary(self, record):
+        completed, total = record["completed"], record["total"]
+        if record.get("cache_hits"):
+            self._print(f"\n{INFO} {record['cache_hits']} result(s) reused from cache")
+
+        self._print("\n=====================================================================================",
+                    f"{INFO} Verification Summary",
+                    "=====================================================================================")
+        for exercise, passed in record["results"].items():
+            self._print(f"{SUCCESS if passed else FAILURE} {exercise}")
+
+        self._print("\n=====================================================================================",
+                    f"{INFO} Overall Progress: {completed}/{total} exercises completed successfully ({completed/total*100:.1f}%)",
+                    "=====================================================================================")
+        if completed == total:
+            self._print(f"\n{SUCCESS} Congratulations! You have successfully completed all exercises!")
+        else:
+            self._print(f"\n{WARNING} You still have {total - completed} exercise(s) to complete or fix.")
+
+    def _error(self, record):
+        self._print(f"\n{INFO} Trainee: {Path(record['workspace']).name}",
+                    f"{FAILURE} Verification failed: {record['error']}")
+
+    def _cohort(self, record):
+        print_cohort_summary(record["workspaces"], stream=self.stream)
+
+
+class JsonLinesReporter:
+    """Write every result record as one JSON object per line, flushed immediately."""
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def emit(self, record):
+        stream = self.stream or sys.stdout
+        stream.write(json.dumps(record) + "\n")
+        stream.flush()
+
+    def close(self):
+        pass
+
+
+class RecordingReporter:
+    """Keep the records in memory, e.g. to send them back from a batch worker."""
+
+    def __init__(self):
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def close(self):
+        pass
+
+
+class JUnitReporter:
+    """Collect check, formatting and validate results and write them as JUnit XML on close."""
+
+    def __init__(self, path):
+        self.path = path
+        self.suites = {}
+
+    def emit(self, record):
+        if record["type"] == "check":
+            self._case(record["workspace"], record["exercise"], record["check"], record["passed"])
+        elif record["type"] == "policy":
+            # Only hard-mandatory policies stop a TFE run
+            passed = record["passed"] or record["enforcement"] != "hard-mandatory"
+            self._case(record["workspace"], "Sentinel policies", record["policy"], passed, "\n".join(record["violations"]))
+        elif record["type"] == "format":
+            name = record["file"] or "terraform fmt"
+            self._case(record["workspace"], "Formatting", name, record["formatted"], record["error"] or record["diff"])
+        elif record["type"] == "validate":
+            self._case(record["workspace"], "Validation", "terraform validate", record["valid"], record["output"])
+        elif record["type"] == "error":
+            self._case(record["workspace"], "Verification", "run", False, record["error"])
+
+    def _case(self, workspace, classname, name, passed, details=None):
+        self.suites.setdefault(workspace, []).append((classname, name, passed, details))
+
+    def close(self):
+        root = ElementTree.Element("testsuites", name="terraform-workshop")
+        for workspace, cases in self.suites.items():
+            failures = sum(1 for case in cases if not case[2])
+            suite = ElementTree.SubElement(root, "testsuite", name=workspace, tests=str(len(cases)), failures=str(failures))
+            for classname, name, passed, details in cases:
+                case = ElementTree.SubElement(suite, "testcase", classname=classname, name=name)
+                if not passed:
+                    failure = ElementTree.SubElement(case, "failure", message=name)
+                    failure.text = details or ""
+        root.set("tests", str(sum(len(cases) for cases in self.suites.values())))
+        root.set("failures", str(sum(1 for cases in self.suites.values() for case in cases if not case[2])))
+        ElementTree.ElementTree(root).write(self.path, encoding="utf-8", xml_declaration=True)
+
+
+def _file_property(filename):
+    return property(lambda self: self.text(filename), doc=f"Content of {filename}, read on first access.")
+
+
 class TerraformVerifier:
-    def __init__(self, directory="."):
+    main_tf = _file_property("main.tf")
+    variables_tf = _file_property("variables.tf")
+    outputs_tf = _file_property("outputs.tf")
+    versions_tf = _file_property("versions.tf")
+    tfvars = _file_property("terraform.tfvars")
+
+    def __init__(self, directory=".", cache=None, timeout=DEFAULT_TIMEOUT, fix_format=False, rules=None, reporters=None, profiler=None,
+                 plugin_cache=None, max_file_bytes=DEFAULT_MAX_FILE_BYTES):
         self.base_dir = Path(directory)
-        self.main_tf = self._read_file("main.tf")
-        self.variables_tf = self._read_file("variables.tf")
-        self.outputs_tf = self._read_file("outputs.tf")
-        self.versions_tf = self._read_file("versions.tf")
-        self.tfvars = self._read_file("terraform.tfvars")
-        
-        # Get the prefix and env from tfvars or use defaults
-        self.prefix = self._extract_tfvars_value("prefix", "unknown-prefix")
-        self.env = self._extract_tfvars_value("env", "dev")
+        self.reporters = reporters if reporters is not None else [TextReporter()]
+        self.profiler = profiler
+        self.plugin_cache = plugin_cache
+        self.cache = cache
+        self.timeout = timeout
+        self.fix_format = fix_format
+        self.rules = rules if isinstance(rules, RuleRegistry) else load_rules(rules or DEFAULT_RULES_FILE)
+        self.files = WorkspaceFiles(directory, max_bytes=max_file_bytes, profiler=profiler)
+        self._documents = {}
+        self._search_hits = {}
+        self._parse_lock = threading.Lock()
+
+    @property
+    def prefix(self):
+        return self._extract_tfvars_value("prefix", "unknown-prefix")
+
+    @property
+    def env(self):
+        return self._extract_tfvars_value("env", "dev")
+
+    def text(self, filename):
+        """Return the content of a workspace file, read on first use."""
+        return self.files.text(filename)
+
+    def document(self, filename):
+        """Parse a file once on first use, the rules only look up blocks in the index."""
+        document = self._documents.get(filename)
+        if document is None:
+            # The static checks and the shared init may ask for the same file at once
+            with self._parse_lock:
+                document = self._documents.get(filename)
+                if document is None:
+                    text = self.text(filename)
+                    with self._span(filename, "parse"):
+                        document = self._documents[filename] = HCLDocument(text)
+        return document
+
+    def file_exists(self, filename):
+        return self.files.exists(filename)
+
+    def search(self, filename, name):
+        """Return whether the search rule ``name`` matches in a file, remembered until the file changes."""
+        hits = self._search_hits.setdefault(filename, {})
+        if name not in hits:
+            hits[name] = bool(self.rules.patterns[name].search(self.text(filename)))
+        return hits[name]
         
-    def _read_file(self, filename):
-        """Read a file and return its content."""
-        try:
-            with open(self.base_dir / filename, 'r') as f:
-                return f.read()
-        except Exception:
-            return ""
-    
+    def configuration(self):
+        """Return the parsed .tf files of the workspace."""
+        return [self.document(filename) for filename in self.files.names(".tf")]
+
+    def resolve(self, expression):
+        """Follow a plain var.* or local.* reference to its value, None if it is only known during a plan."""
+        seen = set()
+        while expression is not None:
+            match = _REFERENCE.fullmatch(expression.strip())
+            if not match or match.group(0) in seen:
+                return expression if not match else None
+            seen.add(match.group(0))
+            kind, name = match.groups()
+            if kind == "var":
+                expression = self.document("terraform.tfvars").attributes.get(name)
+                if expression is None:
+                    defaults = [block.attributes.get("default") for document in self.configuration()
+                                for block in document.blocks("variable", name)]
+                    expression = next((default for default in defaults if default is not None), None)
+            else:
+                expression = next((document.merged_attributes("locals")[name] for document in self.configuration()
+                                   if name in document.merged_attributes("locals")), None)
+        return None
+
+    def reload(self, filename):
+        """Forget a single file after it changed and drop what was parsed from it."""
+        self.files.invalidate(filename)
+        self._documents.pop(filename, None)
+        self._search_hits.pop(filename, None)
+
     def _extract_tfvars_value(self, key, default=""):
         """Extract a value from terraform.tfvars."""
-        pattern = rf'{key}\s*=\s*"?([^"\n]+)"?'
-        match = re.search(pattern, self.tfvars)
-        if match:
-            return match.group(1)
-        return default
+        expression = self.document("terraform.tfvars").attributes.get(key)
+        if expression is None:
+            return default
+        value = hcl_string(expression)
+        return expression if value is None else value
+
+    def _span(self, name, category, **args):
+        """Time a block if profiling is enabled."""
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.span(name, category, **args)
+
+    def _emit(self, record_type, **fields):
+        """Send a result record to every reporter as soon as it is known."""
+        record = {"type": record_type, "workspace": str(self.base_dir), **fields}
+        for reporter in self.reporters:
+            reporter.emit(record)
+
+    def _input_digest(self, filenames):
+        """Hash the content of the given files as they were read by the checks.
+
+        The checks see a file above the size limit as empty, so that is part
+        of the hash, not only its raw content.
+        """
+        digest = hashlib.sha256()
+        for filename in filenames:
+            digest.update(f"{filename}:{self.file_exists(filename)}:{self.files.oversized(filename)}:".encode())
+            digest.update(self.files.digest(filename))
+        return digest.hexdigest()
+
+    def _workspace_digest(self):
+        """Hash all files terraform fmt and validate look at, including the init state."""
+        digest = hashlib.sha256()
+        filenames = self.files.names(".tf") + self.files.names(".tfvars")
+        filenames += [".terraform.lock.hcl", os.path.join(".terraform", "modules", "modules.json")]
+        for filename in filenames:
+            digest.update(filename.encode() + b"\0")
+            digest.update(self.files.digest(filename))
+        return digest.hexdigest()
+
+    def run_exercise(self, exercise):
+        """Evaluate and report all rules of an exercise, returning (passed, message) pairs."""
+        items = []
+        for rule in exercise.rules:
+            with self._span(rule.message, "check", exercise=exercise.name):
+                passed = bool(rule.evaluate(self))
+            items.append((passed, rule.message))
+            self._emit("check", exercise=exercise.name, title=exercise.title, check=rule.message, passed=passed)
+        return items
+
+    def _run_exercise_cached(self, exercise):
+        """Run an exercise or replay its result from the cache if its inputs are unchanged."""
+        with self._span(exercise.name, "exercise"):
+            if self.cache is None:
+                return all(passed for passed, _ in self.run_exercise(exercise))
+            key = self.cache.key(exercise.name, self.rules.digest, self._input_digest(exercise.inputs))
+            cached = self.cache.get(key)
+            if cached is not None:
+                for passed, message in cached["items"]:
+                    self._emit("check", exercise=exercise.name, title=exercise.title, check=message, passed=passed, cached=True)
+                return all(passed for passed, _ in cached["items"])
+            items = self.run_exercise(exercise)
+            self.cache.put(key, {"items": items})
+            return all(passed for passed, _ in items)
+
+    def _run_cached_command(self, name, command, workspace_digest):
+        """Run a terraform command unless its result for this workspace state is cached."""
+        if self.cache is None:
+            return self.run_terraform_command(command)
+        key = self.cache.key(name, workspace_digest, self._init_mode(command))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return tuple(cached)
+        result, transient = self._run_terraform(command)
+        if not transient:
+            self.cache.put(key, list(result))
+        return result
     
+    def _uses_shared_init(self, command):
+        return not (self.plugin_cache is None or command[0] != "validate" or (self.base_dir / ".terraform").is_dir()
+                    or not shutil.which("terraform"))
+
+    def _init_mode(self, command):
+        """Describe where a command runs, so results in place and against a shared init are cached apart.
+
+        Which shared init is used follows from the .tf files and the lock
+        file, which are part of the workspace digest already.
+        """
+        if not self._uses_shared_init(command):
+            return "in place"
+        return f"shared init in {self.plugin_cache.directory}"
+
+    def _shared_init(self, command):
+        """Return the shared init to validate against if the trainee did not run terraform init."""
+        if not self._uses_shared_init(command):
+            return None
+        with self._span("shared init", "phase", children=True):
+            return self.plugin_cache.prepare(self.base_dir, self.configuration())
+
+    @contextlib.contextmanager
+    def _terraform_directory(self, init_dir):
+        """Yield the working directory and environment of a terraform command."""
+        if init_dir is None:
+            yield self.base_dir, None
+            return
+        with self.plugin_cache.workspace_view(self.base_dir, init_dir) as view:
+            yield view, self.plugin_cache.environment(init_dir / ".terraform")
+
     def run_terraform_command(self, command):
         """Run a terraform command and return the output."""
+        return self._run_terraform(command)[0]
+
+    def _run_terraform(self, command):
+        """Run a terraform command and return its output and whether the result is transient.
+
+        A timeout or a command that could not be started says nothing about
+        the workspace, so such results are not cached. If the shared init
+        failed, the command is not run at all and its return code is None.
+        """
         try:
-            result = subprocess.run(
-                ["terraform"] + command,
-                capture_output=True,
-                text=True,
-                check=False
-            )
-            return result.stdout, result.stderr, result.returncode
+            init_dir = self._shared_init(command)
         except Exception as e:
-            return "", str(e), 1
-        
-    def check_file_structure(self):
-        print(f"\n{INFO} Checking Exercise 0: File structure...")
-        print("-------------------------------------------------------------------------------------")
-        main_exists = Path(self.base_dir / "main.tf").exists()
-        variables_exists = Path(self.base_dir / "variables.tf").exists()
-        outputs_exists = Path(self.base_dir / "outputs.tf").exists()
-        versions_exists = Path(self.base_dir / "versions.tf").exists()
-        tfvars_exists = Path(self.base_dir / "terraform.tfvars").exists()
-        
-        print(f"{SUCCESS if main_exists else FAILURE} main.tf found")
-        print(f"{SUCCESS if variables_exists else FAILURE} variables.tf found")
-        print(f"{SUCCESS if outputs_exists else FAILURE} outputs.tf found")
-        print(f"{SUCCESS if versions_exists else FAILURE} versions.tf found")
-        print(f"{SUCCESS if tfvars_exists else FAILURE} terraform.tfvars found")
-        
-        return main_exists and variables_exists and outputs_exists and versions_exists and tfvars_exists
-    
-    def check_terraform_cloud_config(self):
-        """Check Exercise 1: Terraform Cloud Configuration."""
-        print(f"\n{INFO} Checking Exercise 1: Terraform Cloud Configuration...")
-        print("-------------------------------------------------------------------------------------")
-        
-        cloud_config_found = "cloud {" in self.main_tf
-        hostname_found = re.search(r'hostname\s*=\s*"tfe\.axa-cloud\.com"', self.main_tf)
-        organization_found = re.search(r'organization\s*=\s*"TFE-Training"', self.main_tf)
-        workspace_name_found = "workspaces {" in self.main_tf and "name =" in self.main_tf
-        
-        print(f"{SUCCESS if cloud_config_found else FAILURE} Terraform Cloud block found")
-        print(f"{SUCCESS if hostname_found else FAILURE} Hostname set to 'tfe.axa-cloud.com'")
-        print(f"{SUCCESS if organization_found else FAILURE} Organization set to 'TFE-Training'")
-        print(f"{SUCCESS if workspace_name_found else FAILURE} Workspace name configured")
-        
-        return cloud_config_found and hostname_found and organization_found and workspace_name_found
-    
-    def check_provider_config(self):
-        """Check Exercise 2: Provider Configuration with Default Tags."""
-        print(f"\n{INFO} Checking Exercise 2: Provider Configuration with Default Tags...")
-        print("-------------------------------------------------------------------------------------")
-        
-        provider_found = "provider \"aws\"" in self.main_tf
-        region_correct = "region = \"eu-central-1\"" in self.main_tf or "region = 'eu-central-1'" in self.main_tf
-        tags_found = "default_tags" in self.main_tf and "tags" in self.main_tf
-        tfe_tag_found = "\"tfe-training\" = \"true\"" in self.main_tf or "'tfe-training' = 'true'" in self.main_tf
-        owner_tag_found = "\"owner\"" in self.main_tf and "var.prefix" in self.main_tf
-        
-        print(f"{SUCCESS if provider_found else FAILURE} AWS provider block found")
-        print(f"{SUCCESS if region_correct else FAILURE} Region set to 'eu-central-1'")
-        print(f"{SUCCESS if tags_found else FAILURE} Default tags block found")
-        print(f"{SUCCESS if tfe_tag_found else FAILURE} Default tag 'tfe-training=true' found")
-        print(f"{SUCCESS if owner_tag_found else FAILURE} Default tag 'owner=${{var.prefix}}' found")
+            return ("", str(e), None), True
+        try:
+            with self._terraform_directory(init_dir) as (cwd, env), \
+                    self._span(f"terraform {command[0]}", "subprocess", children=True):
+                result = subprocess.run(
+                    ["terraform"] + command,
+                    cwd=cwd,
+                    env=env,
+                    capture_output=True,
+                    text=True,
+                    timeout=self.timeout,
+                    check=False
+                )
+            return (result.stdout, result.stderr, result.returncode), False
+        except subprocess.TimeoutExpired:
+            return ("", f"terraform {' '.join(command)} timed out after {self.timeout} seconds", 1), True
+        except Exception as e:
+            return ("", str(e), 1), True
 
-        return provider_found and region_correct and tags_found and tfe_tag_found and owner_tag_found
-    
-    def check_variables(self):
-        """Check Exercise 3: Variables with Validation."""
-        print(f"\n{INFO} Checking Exercise 3: Variables with Validation...")
-        print("-------------------------------------------------------------------------------------")
-        
-        prefix_var_found = "variable \"prefix\"" in self.variables_tf
-        env_var_found = "variable \"env\"" in self.variables_tf
-        env_validation_found = "validation" in self.variables_tf and "contains" in self.variables_tf and all(env in self.variables_tf for env in ["dev", "test", "prod"])
-        tfvars_file_found = Path(self.base_dir / "terraform.tfvars").exists()
-        env_value_correct = self.env in ["dev", "test", "prod"]
-        
-        print(f"{SUCCESS if prefix_var_found else FAILURE} Variable 'prefix' defined")
-        print(f"{SUCCESS if env_var_found else FAILURE} Variable 'env' defined")
-        print(f"{SUCCESS if env_validation_found else FAILURE} Validation for 'env' variable found")
-        print(f"{SUCCESS if tfvars_file_found else FAILURE} terraform.tfvars file exists")
-        print(f"{SUCCESS if env_value_correct else FAILURE} Environment value is valid ('dev', 'test', or 'prod')")
-        
-        return prefix_var_found and env_var_found and env_validation_found and tfvars_file_found and env_value_correct
-    
-    def check_data_sources(self):
-        """Check Exercise 4: Working with Data Sources."""
-        print(f"\n{INFO} Checking Exercise 4: Working with Data Sources...")
-        print("-------------------------------------------------------------------------------------")
-        
-        caller_identity_found = "data \"aws_caller_identity\"" in self.main_tf
-        vpc_found = "data \"aws_vpc\"" in self.main_tf
-        vpc_filter_correct = "name=\"tag:tfe-training\"" in self.main_tf.replace(" ", "") and "values=[\"true\"]" in self.main_tf.replace(" ", "")
-        subnets_found = "data \"aws_subnets\"" in self.main_tf
-        subnets_filter_correct = "name=\"vpc-id\"" in self.main_tf.replace(" ", "") and "values=[data.aws_vpc.selected.id]" in self.main_tf.replace(" ", "")
-        
-        print(f"{SUCCESS if caller_identity_found else FAILURE} AWS caller identity data source found")
-        print(f"{SUCCESS if vpc_found else FAILURE} VPC data source found")
-        print(f"{SUCCESS if vpc_filter_correct else FAILURE} VPC filter for tag:tfe-training=true found")
-        print(f"{SUCCESS if subnets_found else FAILURE} Subnets data source found")
-        print(f"{SUCCESS if subnets_filter_correct else FAILURE} Subnets filter for vpc-id found")
-        
-        return caller_identity_found and vpc_found and vpc_filter_correct and subnets_found and subnets_filter_correct
-    
-    def check_locals(self):
-        """Check Exercise 5: Using Locals for Naming Conventions."""
-        print(f"\n{INFO} Checking Exercise 5: Using Locals for Naming Conventions...")
-        print("-------------------------------------------------------------------------------------")
-        
-        locals_found = "locals {" in self.main_tf
-        permanent_prefix_found = "permanent_prefix = \"tfe-training\"" in self.main_tf or "permanent_prefix = 'tfe-training'" in self.main_tf
-        final_prefix_found = re.search(r"final_prefix\s*=\s*", self.main_tf)
-        final_prefix_correct = all(part in self.main_tf for part in ["tfe-training", "var.env", "var.prefix"])
-        
-        print(f"{SUCCESS if locals_found else FAILURE} Locals block found")
-        print(f"{SUCCESS if permanent_prefix_found else FAILURE} Local 'permanent_prefix' defined as 'tfe-training'")
-        print(f"{SUCCESS if final_prefix_found else FAILURE} Local 'final_prefix' defined")
-        print(f"{SUCCESS if final_prefix_correct else FAILURE} 'final_prefix' combines permanent_prefix, env, and prefix")
-        
-        return locals_found and permanent_prefix_found and final_prefix_found and final_prefix_correct
-    
-    def check_sns_topics(self):
-        """Check Exercise 6: Resource Creation with For Each and Conditional Expressions."""
-        print(f"\n{INFO} Checking Exercise 6: Resource Creation with For Each and Conditional Expressions...")
-        print("-------------------------------------------------------------------------------------")
-
-        sns_resource_found = re.search(r"resource\s*\"aws_sns_topic\"", self.main_tf)
-        for_each_used = re.search(r"for_each\s*=\s*", self.main_tf) and all(topic in self.main_tf for topic in ["sns-1", "sns-2", "sns-3"])
-        conditional_naming = "each.key" in self.main_tf and "?" in self.main_tf and ":" in self.main_tf
-        
-        print(f"{SUCCESS if sns_resource_found else FAILURE} SNS topic resource found")
-        print(f"{SUCCESS if for_each_used else FAILURE} for_each used with topics sns-1, sns-2, sns-3")
-        print(f"{SUCCESS if conditional_naming else FAILURE} Conditional expression used for naming")
-        
-        return sns_resource_found and for_each_used and conditional_naming
-    
-    def check_import_block(self):
-        """Check Exercise 7: Resource Importing with the Import Block."""
-        print(f"\n{INFO} Checking Exercise 7: Resource Importing with the Import Block...")
-        print("-------------------------------------------------------------------------------------")
-        
-        import_block_found = "import {" in self.main_tf
-        sqs_resource_found = "resource \"aws_sqs_queue\" \"imported_queue\"" in self.main_tf
- 
-        print(f"{SUCCESS if import_block_found else FAILURE} Import block found")
-        print(f"{SUCCESS if sqs_resource_found else FAILURE} SQS queue resource defined")
-    
-        
-        return import_block_found and sqs_resource_found
-    
-    def check_s3_module(self):
-        """Check Exercise 8: Working with Modules."""
-        print(f"\n{INFO} Checking Exercise 8: Working with Modules...")
-        print("-------------------------------------------------------------------------------------")
-
-        module_found = re.search(r"module\s*\"s3_bucket\"", self.main_tf)
-        correct_source = re.search(r"source\s*=\s*\"tfe.axa-cloud.com/Global-Module-Sharing/s3-bucket-synced/aws\"", self.main_tf)
-        correct_version = re.search(r"version\s*=\s*\"5.2.0\"", self.main_tf)
-        bucket_name_correct = re.search(r'bucket\s*=\s*"\$\{local\.final_prefix\}.*"', self.main_tf)
-        versioning_enabled = re.search(r"versioning\s*=\s*{[^}]*enabled\s*=\s*true", self.main_tf)
-
-        print(f"{SUCCESS if module_found else FAILURE} S3 bucket module found")
-        print(f"{SUCCESS if correct_source else FAILURE} Correct module source used")
-        print(f"{SUCCESS if correct_version else FAILURE} Module version 5.2.0 specified")
-        print(f"{SUCCESS if bucket_name_correct else FAILURE} Bucket name uses final_prefix")
-        print(f"{SUCCESS if versioning_enabled else FAILURE} Versioning enabled for bucket")
-        
-        return module_found and correct_source and correct_version and bucket_name_correct and versioning_enabled
-    
-    def check_s3_object(self):
-        """Check Exercise 9: File Operations with S3 Objects."""
-        print(f"\n{INFO} Checking Exercise 9: File Operations with S3 Objects...")
-        print("-------------------------------------------------------------------------------------")
-        
-        s3_object_found = bool(re.search(r'resource\s+"aws_s3_object"', self.main_tf))
-        correct_bucket = bool(re.search(r'module\.s3_bucket\.s3_bucket_id', self.main_tf.replace(" ", "")))
-        correct_key = bool(re.search(r'key\s*=\s*"s3_object\.txt"', self.main_tf))
-        file_content_used = bool(re.search(r'content\s*=\s*file\(', self.main_tf)) and "s3_object.txt" in self.main_tf
-        file_exists = Path(self.base_dir / "s3_object.txt").exists()
-        
-        print(f"{SUCCESS if s3_object_found else FAILURE} S3 object resource found")
-        print(f"{SUCCESS if correct_bucket else FAILURE} S3 object uses bucket from module")
-        print(f"{SUCCESS if correct_key else FAILURE} S3 object key set to 's3_object.txt'")
-        print(f"{SUCCESS if file_content_used else FAILURE} S3 object uses file() function for content (use content attribute, not source)")
-        print(f"{SUCCESS if file_exists else FAILURE} s3_object.txt file exists")
-        
-        return s3_object_found and correct_bucket and correct_key and file_content_used and file_exists
-    
-    def check_ephemeral_resources(self):
-        """Check Exercise 10: Working with Ephemeral Resources."""
-        print(f"\n{INFO} Checking Exercise 10: Working with Ephemeral Resources...")
-        print("-------------------------------------------------------------------------------------")
-        
-        random_password_found = "ephemeral \"aws_secretsmanager_random_password\"" in self.main_tf
-        secret_found = "resource \"aws_secretsmanager_secret\"" in self.main_tf
-        secret_version_found = "resource \"aws_secretsmanager_secret_version\"" in self.main_tf
-        ephemeral_secret_version_found = "ephemeral \"aws_secretsmanager_secret_version\"" in self.main_tf
-        
-        print(f"{SUCCESS if random_password_found else FAILURE} Ephemeral random password resource found")
-        print(f"{SUCCESS if secret_found else FAILURE} Secrets Manager secret resource found")
-        print(f"{SUCCESS if secret_version_found else FAILURE} Secret version resource found")
-        print(f"{SUCCESS if ephemeral_secret_version_found else FAILURE} Ephemeral secret version resource found")
-        
-        return random_password_found and secret_found and secret_version_found and ephemeral_secret_version_found
-    
-    def check_database_setup(self):
-        """Check Exercise 11: Database Setup with Security Groups."""
-        print(f"\n{INFO} Checking Exercise 11: Database Setup with Security Groups...")
-        print("-------------------------------------------------------------------------------------")
-        
-        security_group_found = "resource \"aws_security_group\"" in self.main_tf
-        sg_ingress_correct = "ingress" in self.main_tf and "from_port" in self.main_tf and "to_port" in self.main_tf and "protocol" in self.main_tf and "5432" in self.main_tf
-        db_subnet_group_found = "resource \"aws_db_subnet_group\"" in self.main_tf
-        db_instance_found = "resource \"aws_db_instance\"" in self.main_tf
-        db_password_correct = "password_wo" in self.main_tf and "ephemeral" in self.main_tf
-        
-        print(f"{SUCCESS if security_group_found else FAILURE} Database security group found")
-        print(f"{SUCCESS if sg_ingress_correct else FAILURE} Security group allows PostgreSQL traffic (port 5432)")
-        print(f"{SUCCESS if db_subnet_group_found else FAILURE} DB subnet group found")
-        print(f"{SUCCESS if db_instance_found else FAILURE} RDS instance found")
-        print(f"{SUCCESS if db_password_correct else FAILURE} RDS instance uses password from ephemeral resource")
-        
-        return security_group_found and sg_ingress_correct and db_subnet_group_found and db_instance_found and db_password_correct
-    
-    def check_outputs(self):
-        """Check Exercise 12: Creating Outputs."""
-        print(f"\n{INFO} Checking Exercise 12: Creating Outputs...")
-        print("-------------------------------------------------------------------------------------")
-        
-        vpc_id_output = "output \"vpc_id\"" in self.outputs_tf
-        subnet_ids_output = "output \"subnet_ids\"" in self.outputs_tf
-        sns_topic_arns_output = "output \"sns_topic_arns\"" in self.outputs_tf
-        for_expression_used = "for" in self.outputs_tf and "aws_sns_topic.sns_topic" in self.outputs_tf
-        
-        print(f"{SUCCESS if vpc_id_output else FAILURE} VPC ID output found")
-        print(f"{SUCCESS if subnet_ids_output else FAILURE} Subnet IDs output found")
-        print(f"{SUCCESS if sns_topic_arns_output else FAILURE} SNS topic ARNs output found")
-        print(f"{SUCCESS if for_expression_used else FAILURE} For expression used in outputs")
+    async def run_terraform_command_async(self, command):
+        """Run a terraform command without blocking the event loop, killing it after the timeout."""
+        return (await self._run_terraform_async(command))[0]
+
+    async def _run_terraform_async(self, command):
+        """Async variant of _run_terraform."""
+        try:
+            init_dir = await asyncio.to_thread(self._shared_init, command)
+        except Exception as e:
+            return ("", str(e), None), True
+        with self._terraform_directory(init_dir) as (cwd, env):
+            return await self._run_terraform_process(command, cwd, env)
+
+    async def _run_terraform_process(self, command, cwd, env):
+        try:
+            with self._span(f"terraform {command[0]} (spawn)", "subprocess"):
+                process = await asyncio.create_subprocess_exec(
+                    "terraform", *command,
+                    cwd=cwd,
+                    env=env,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+        except Exception as e:
+            return ("", str(e), 1), True
+        with self._span(f"terraform {command[0]}", "subprocess", children=True):
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), self.timeout)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                return ("", f"terraform {' '.join(command)} timed out after {self.timeout} seconds", 1), True
+            except asyncio.CancelledError:
+                process.kill()
+                raise
+        return (stdout.decode(errors="replace"), stderr.decode(errors="replace"), process.returncode), False
+
+    async def _run_cached_command_async(self, name, command, workspace_digest):
+        """Async variant of _run_cached_command."""
+        if self.cache is None:
+            return await self.run_terraform_command_async(command)
+        key = self.cache.key(name, workspace_digest, self._init_mode(command))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return tuple(cached)
+        result, transient = await self._run_terraform_async(command)
+        if not transient:
+            self.cache.put(key, list(result))
+        return result
+
+    def _format_targets(self):
+        """Return the files terraform fmt looks at in the directory."""
+        return self.files.names(".tf", ".tfvars")
+
+    async def _check_format_async(self, workspace_digest):
+        """Report per file whether it is formatted, without touching it unless fix_format is set."""
+        key = self.cache.key("fmt", self.fix_format, workspace_digest) if self.cache is not None else None
+        cached = self.cache.get(key) if key else None
+        if cached is not None:
+            return cached
+
+        filenames = self._format_targets()
+        if self.fix_format:
+            (stdout, stderr, returncode), transient = await self._run_terraform_async(["fmt", "."])
+            result = {"mode": "fix", "files": {}, "error": stderr if returncode else None}
+            # fmt may have rewritten files
+            for name in filenames:
+                self.files.invalidate(name)
+            if key and returncode == 0 and not transient:
+                # Remember the formatted state
+                key = self.cache.key("fmt", True, self._workspace_digest())
+        elif shutil.which("terraform"):
+            (stdout, stderr, returncode), transient = await self._run_terraform_async(["fmt", "-check", "-diff", "-no-color", "."])
+            diffs = parse_fmt_diff(stdout, filenames)
+            error = None
+            if returncode != 0 and not diffs:
+                error = stderr or stdout or f"terraform fmt exited with {returncode}"
+            result = {"mode": "terraform", "files": {name: diffs.get(name) for name in filenames}, "error": error}
+        else:
+            files = {}
+            for name in filenames:
+                diff = format_diff(name, self.text(name))
+                files[name] = diff or None
+            result = {"mode": "builtin", "files": files, "error": None}
+            transient = False
+
+        if key and not transient:
+            self.cache.put(key, result)
+        return result
+
+    async def _run_terraform_phase(self, fmt=None):
+        """Check formatting and run terraform validate at the same time.
+
+        If the formatting result is passed in, only validate is run.
+        """
+        with self._span("terraform", "phase"):
+            return await self._run_terraform_commands(fmt)
+
+    async def _run_terraform_commands(self, fmt):
+        workspace_digest = self._workspace_digest() if self.cache is not None else None
+        validate = self._run_cached_command_async("validate", ["validate"], workspace_digest)
+        if fmt is not None:
+            return fmt, await validate
+        return await asyncio.gather(self._check_format_async(workspace_digest), validate)
+
+    def run_policies(self):
+        """Evaluate the lab's Sentinel policies locally and report their violations.
+
+        Policies read the whole configuration, so their results are cached
+        per content of all .tf files and terraform.tfvars.
+        """
+        self.policy_results = {}
+        if self.cache is not None:
+            inputs = self._input_digest(self.files.names(".tf") + ["terraform.tfvars"])
+        for policy in self.rules.policies:
+            with self._span(policy.name, "policy"):
+                key = self.cache.key(policy.name, self.rules.digest, inputs) if self.cache is not None else None
+                cached = self.cache.get(key) if key else None
+                if cached is not None:
+                    violations, unknown, extra = cached["violations"], cached["unknown"], {"cached": True}
+                else:
+                    violations, unknown = policy.evaluate(self)
+                    extra = {}
+                    if key:
+                        self.cache.put(key, {"violations": violations, "unknown": unknown})
+            self.policy_results[policy.name] = not violations
+            self._emit("policy", policy=policy.name, enforcement=policy.enforcement, message=policy.message,
+                       passed=not violations, violations=violations, unknown=unknown, **extra)
+        return self.policy_results
+
+    def _run_static_checks(self):
+        with self._span("static checks", "phase"):
+            results = {exercise.name: self._run_exercise_cached(exercise) for exercise in self.rules.exercises}
+            self.run_policies()
+            return results
+
+    async def _run_checks_async(self):
+        """Run the static checks in a thread while the terraform subprocesses are running.
+
+        With fix_format, terraform fmt rewrites the files in place, so it has
+        to finish before anything else reads them.
+        """
+        fmt = None
+        if self.fix_format:
+            with self._span("terraform fmt", "phase"):
+                fmt = await self._check_format_async(self._workspace_digest() if self.cache is not None else None)
+        terraform = asyncio.ensure_future(self._run_terraform_phase(fmt))
+        try:
+            results = await asyncio.to_thread(self._run_static_checks)
+        finally:
+            # Cancelling the subprocesses while they are being spawned can hang the
+            # event loop, e.g. when a reporter fails on a closed pipe
+            fmt, validate = await terraform
+        return results, fmt, validate
         
-        return vpc_id_output and subnet_ids_output and sns_topic_arns_output and for_expression_used
-    
+    def _emit_format(self, result):
+        if result["mode"] == "fix" or result["error"] is not None:
+            self._emit("format", mode=result["mode"], file=None, formatted=result["error"] is None, diff=None, error=result["error"])
+            return
+        for name, diff in result["files"].items():
+            self._emit("format", mode=result["mode"], file=name, formatted=diff is None, diff=diff, error=None)
+
+    def _emit_validate(self, result):
+        stdout, stderr, returncode = result
+        if returncode is None:
+            # The shared init failed, which is not the trainee's error
+            self._emit("diagnostic", file=None, message=f"terraform validate skipped: {stderr}")
+            return None
+        self._emit("validate", valid=returncode == 0, output=stderr)
+        return returncode == 0
+
+    def _emit_diagnostics(self):
+        for filename, message in sorted(self.files.diagnostics.items()):
+            self._emit("diagnostic", file=filename, message=message)
+
+    def check_terraform_validate(self):
+        """Run terraform validate and report whether the configuration is valid."""
+        workspace_digest = self._workspace_digest() if self.cache is not None else None
+        return self._emit_validate(self._run_cached_command("validate", ["validate"], workspace_digest))
+
     def run_all_checks(self):
         """Run all verification checks and return overall results."""
-        print(f"\n{INFO} Starting Terraform Workshop Verification...")
-        print("=====================================================================================")
-        
-                
-        # Run terraform validate if terraform is available
-        print(f"\n{INFO} Running terraform fmt...")
-        print("-------------------------------------------------------------------------------------")
-        stdout, stderr, returncode = self.run_terraform_command(["fmt", "."])
-        if returncode == 0:
-            print(f"{SUCCESS} Terraform files formattted")
-        else:
-            print(f"{FAILURE} Terraform formatting failed")
-            print(stderr)
-        
-        
+        self._emit("start")
 
-        # Run all checks
-        results = {
-            "Exercise 0: File structure": self.check_file_structure(),
-            "Exercise 1: Terraform Cloud Configuration": self.check_terraform_cloud_config(),
-            "Exercise 2: Provider Configuration": self.check_provider_config(),
-            "Exercise 3: Variables with Validation": self.check_variables(),
-            "Exercise 4: Data Sources": self.check_data_sources(),
-            "Exercise 5: Locals for Naming": self.check_locals(),
-            "Exercise 6: For Each and Conditionals": self.check_sns_topics(),
-            "Exercise 7: Import Block": self.check_import_block(),
-            "Exercise 8: S3 Module": self.check_s3_module(),
-            "Exercise 9: S3 Object": self.check_s3_object(),
-            "Exercise 10: Ephemeral Resources": self.check_ephemeral_resources(),
-            "Exercise 11: Database Setup": self.check_database_setup(),
-            "Exercise 12: Outputs": self.check_outputs()
-        }
-        
-        # Run terraform validate if terraform is available
-        print(f"\n{INFO} Running terraform validate...")
-        print("-------------------------------------------------------------------------------------")
-        stdout, stderr, returncode = self.run_terraform_command(["validate"])
-        if returncode == 0:
-            print(f"{SUCCESS} Terraform configuration is valid")
-        else:
-            print(f"{FAILURE} Terraform configuration is invalid:")
-            print(stderr)
-        
-        # Summary
-        print("\n=====================================================================================")
-        print(f"{INFO} Verification Summary")
-        print("=====================================================================================")
+        # Run the static checks while the formatting check and validate run in the background
+        with self._span("run all checks", "phase"):
+            results, fmt, validate = asyncio.run(self._run_checks_async())
+        self._emit_format(fmt)
+        self._emit_validate(validate)
+        self._emit_diagnostics()
+
+        cache_hits = 0
+        if self.cache is not None:
+            if self.cache.writes:
+                with self._span("prune cache", "phase"):
+                    self.cache.prune()
+            cache_hits = self.cache.hits
         
+        self.results = {exercise: bool(passed) for exercise, passed in results.items()}
         completed = sum(1 for result in results.values() if result)
         total = len(results)
-        
-        for exercise, passed in results.items():
-            print(f"{SUCCESS if passed else FAILURE} {exercise}")
-        
-        print("\n=====================================================================================")
-        print(f"{INFO} Overall Progress: {completed}/{total} exercises completed successfully ({completed/total*100:.1f}%)")
-        print("=====================================================================================")
-        
-        if completed == total:
-            print(f"\n{SUCCESS} Congratulations! You have successfully completed all exercises!")
-        else:
-            print(f"\n{WARNING} You still have {total - completed} exercise(s) to complete or fix.")
-        
+        self._emit("summary", completed=completed, total=total, results=self.results, policies=self.policy_results,
+                   cache_hits=cache_hits)
         return completed, total
 
 
-def main():
-    """Main function to run the verification script."""
-    print("\nTerraform Workshop Verifier")
-    print("=====================================================================================")
-    print("This script will verify your progress through the Terraform workshop exercises.")
-    print("It checks for the presence and correctness of various Terraform resources and configurations.")
-    
-    # Get the directory to check (default is current directory)
-    directory = "."
-    
-    # Create the verifier and run all checks
-    verifier = TerraformVerifier(directory)
+def verify_workspace(directory, profile=False, **options):
+    """Verify a single trainee directory and return its results.
+
+    The result records are collected instead of reported so that workspaces
+    verified in parallel do not interleave their output. With profile, the
+    recorded spans are returned as well.
+    """
+    recorder = RecordingReporter()
+    profiler = Profiler() if profile else None
+    with profiler.span(Path(directory).name, "workspace") if profiler else contextlib.nullcontext():
+        verifier = TerraformVerifier(directory, reporters=[recorder], profiler=profiler, **options)
+        completed, total = verifier.run_all_checks()
+    return {
+        "directory": str(directory),
+        "results": verifier.results,
+        "completed": completed,
+        "total": total,
+        "records": recorder.records,
+        "spans": profiler.spans if profiler else [],
+    }
+
+
+def _snapshot(directory, filenames):
+    """Return (mtime, size) of every watched file, None for missing ones."""
+    snapshot = {}
+    for filename in filenames:
+        try:
+            stat = os.stat(Path(directory) / filename)
+            snapshot[filename] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            snapshot[filename] = None
+    return snapshot
+
+
+def watch(directory, interval=0.5, debounce=2.0, **options):
+    """Re-verify a directory whenever one of the watched files is saved.
+
+    Only the checks reading a changed file are re-run. terraform validate is
+    debounced so that a burst of saves results in a single subprocess.
+    """
+    verifier = TerraformVerifier(directory, **options)
     verifier.run_all_checks()
+    inputs = set(FILE_ATTRIBUTES).union(verifier.rules.inputs)
+    snapshot = _snapshot(directory, sorted(inputs.union(verifier.files.names(".tf"))))
+    validate_due = None
+    verifier._emit("watching", directory=str(Path(directory).resolve()))
+
+    try:
+        while True:
+            time.sleep(interval)
+            # The policies read every .tf file, including ones created later
+            watched = sorted(inputs.union(snapshot, (path.name for path in Path(directory).glob("*.tf"))))
+            current = _snapshot(directory, watched)
+            changed = [filename for filename in watched if current[filename] != snapshot.get(filename)]
+            snapshot = current
+
+            if changed:
+                verifier._emit("changed", files=changed)
+                for filename in changed:
+                    verifier.reload(filename)
+                for exercise in verifier.rules.exercises:
+                    if any(filename in exercise.inputs for filename in changed):
+                        verifier.results[exercise.name] = bool(verifier._run_exercise_cached(exercise))
+                if any(filename.endswith((".tf", ".tfvars")) for filename in changed):
+                    verifier.run_policies()
+                verifier._emit_diagnostics()
+                completed = sum(1 for passed in verifier.results.values() if passed)
+                verifier._emit("progress", completed=completed, total=len(verifier.results))
+                validate_due = time.monotonic() + debounce
+            elif validate_due is not None and time.monotonic() >= validate_due:
+                validate_due = None
+                verifier.check_terraform_validate()
+    except KeyboardInterrupt:
+        verifier._emit("stopped")
+
+
+def discover_workspaces(pattern):
+    """Return the trainee directories matching a root directory or a glob."""
+    if Path(pattern).is_dir():
+        candidates = [path for path in Path(pattern).iterdir() if path.is_dir()]
+    else:
+        candidates = [Path(path) for path in glob.glob(pattern) if Path(path).is_dir()]
+    return sorted(path for path in candidates if any(path.glob("*.tf")))
+
+
+def run_batch(directories, workers=None, reporters=None, profiler=None, **options):
+    """Verify several trainee directories with a process pool.
+
+    The records of each workspace are passed on to the reporters as soon as
+    it is done, followed by one cohort record once all workspaces finished.
+    """
+    reporters = reporters if reporters is not None else [TextReporter(batch=True)]
+    outcomes = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(verify_workspace, directory, profile=profiler is not None, **options): directory
+            for directory in directories
+        }
+        for future in as_completed(futures):
+            directory = futures[future]
+            try:
+                outcome = future.result()
+            except Exception as e:
+                outcome = {"directory": str(directory), "results": {}, "completed": 0, "total": 0, "error": str(e)}
+                outcome["records"] = [{"type": "error", "workspace": str(directory), "error": str(e)}]
+                outcome["spans"] = []
+            records = outcome.pop("records")
+            if profiler is not None:
+                profiler.merge(outcome.pop("spans"))
+            else:
+                outcome.pop("spans")
+            outcomes[str(directory)] = outcome
+            for record in records:
+                for reporter in reporters:
+                    reporter.emit(record)
+
+    cohort = {"type": "cohort", "workspaces": [outcomes[str(directory)] for directory in directories]}
+    for reporter in reporters:
+        reporter.emit(cohort)
+    return outcomes
+
+
+def print_cohort_summary(outcomes, stream=None):
+    """Print one line per trainee with progress and the exercises still missing."""
+    def show(line):
+        print(line, file=stream or sys.stdout)
+
+    show("\n=====================================================================================")
+    show(f"{INFO} Cohort Summary")
+    show("=====================================================================================")
+
+    width = max([len(Path(outcome["directory"]).name) for outcome in outcomes] + [7])
+    show(f"{'Trainee'.ljust(width)}  Progress       Missing")
+    for outcome in outcomes:
+        name = Path(outcome["directory"]).name.ljust(width)
+        if "error" in outcome:
+            show(f"{name}  error          {outcome['error']}")
+            continue
+        completed, total = outcome["completed"], outcome["total"]
+        progress = f"{completed}/{total} ({completed/total*100:.0f}%)"
+        missing = [exercise.split(":")[0] for exercise, passed in outcome["results"].items() if not passed]
+        show(f"{name}  {progress.ljust(13)}  {', '.join(missing) or '-'}")
+
+    finished = sum(1 for outcome in outcomes if outcome.get("total") and outcome["completed"] == outcome["total"])
+    show(f"\n{INFO} {finished}/{len(outcomes)} trainees completed all exercises")
+
+
+class VerifierService:
+    """Keep trainee workspaces parsed and their results in memory, and verify them on request.
+
+    Verifications run on a bounded thread pool. A request for a workspace that
+    is already being verified waits for that run instead of starting another
+    one, and a workspace whose files did not change since its last run is
+    answered from memory without running anything.
+    """
+
+    def __init__(self, pattern=".", workers=None, **options):
+        self.pattern = pattern
+        self.options = options
+        self._executor = ThreadPoolExecutor(max_workers=workers or min(4, os.cpu_count() or 1))
+        self._lock = threading.Lock()
+        self._running = {}
+        self._workspaces = {}
+
+    def workspaces(self):
+        """Return the trainee directories served, including the root if it is a workspace itself."""
+        directories = discover_workspaces(self.pattern)
+        if Path(self.pattern).is_dir() and any(Path(self.pattern).glob("*.tf")):
+            directories.insert(0, Path(self.pattern))
+        return [directory.resolve() for directory in directories]
+
+    def submit(self, directory):
+        """Return a future for the outcome of a workspace, sharing a run that is already in progress."""
+        key = str(directory)
+        with self._lock:
+            future = self._running.get(key)
+            if future is None:
+                future = self._running[key] = self._executor.submit(self._verify, key)
+            else:
+                return future
+        future.add_done_callback(lambda _: self._finished(key, future))
+        return future
+
+    def _finished(self, key, future):
+        with self._lock:
+            if self._running.get(key) is future:
+                del self._running[key]
+
+    def verify(self, path):
+        """Verify one workspace of the cohort and return its outcome including the result records."""
+        directory = Path(path).resolve()
+        if not directory.is_dir():
+            raise FileNotFoundError(f"{path} is not a directory")
+        if directory not in self.workspaces():
+            raise PermissionError(f"{path} is not a trainee directory of {self.pattern}")
+        return self.submit(directory).result()
+
+    def cohort(self, wait=False):
+        """Return the last known state of every workspace and re-verify the ones that changed."""
+        futures = {directory: self.submit(directory) for directory in self.workspaces()}
+        if wait:
+            concurrent.futures.wait(futures.values())
+        workspaces = []
+        for directory, future in futures.items():
+            state = self._workspaces.get(str(directory))
+            entry = {key: value for key, value in state["outcome"].items() if key != "records"} if state else {"directory": str(directory)}
+            entry["verifying"] = not future.done()
+            if future.done() and future.exception() is not None:
+                entry["error"] = str(future.exception())
+            workspaces.append(entry)
+        finished = sum(1 for entry in workspaces if entry.get("total") and entry["completed"] == entry["total"])
+        return {"workspaces": workspaces, "finished": finished}
+
+    def _verify(self, key):
+        # Runs for one workspace never overlap, submit hands out the running one
+        state = self._workspaces.get(key)
+        snapshot = _snapshot(key, self._watched(key, state))
+        if state is not None and state["snapshot"] == snapshot:
+            return state["outcome"]
+
+        if state is None:
+            options = dict(self.options)
+            if options.get("cache") is not None:
+                # Each workspace counts its own cache hits
+                cache = options["cache"]
+                options["cache"] = ResultCache(cache.directory, cache.max_bytes, cache.max_age)
+            verifier = TerraformVerifier(key, reporters=[], **options)
+        else:
+            verifier = state["verifier"]
+            for filename in snapshot:
+                if snapshot[filename] != state["snapshot"].get(filename):
+                    verifier.reload(filename)
+        recorder = RecordingReporter()
+        verifier.reporters = [recorder]
+        if verifier.cache is not None:
+            verifier.cache.hits = verifier.cache.writes = 0
+
+        start = time.perf_counter()
+        completed, total = verifier.run_all_checks()
+        outcome = {
+            "directory": key,
+            "results": verifier.results,
+            "policies": verifier.policy_results,
+            "completed": completed,
+            "total": total,
+            "verified_at": time.time(),
+            "duration": time.perf_counter() - start,
+            "records": recorder.records,
+        }
+        self._workspaces[key] = {"verifier": verifier, "snapshot": snapshot, "outcome": outcome}
+        return outcome
+
+    def _watched(self, directory, state):
+        """Return every file whose change invalidates the results of a workspace."""
+        try:
+            with os.scandir(directory) as entries:
+                filenames = {entry.name for entry in entries if entry.is_file()}
+        except OSError:
+            filenames = set()
+        filenames.update(FILE_ATTRIBUTES, load_rules(self.options.get("rules") or DEFAULT_RULES_FILE).inputs)
+        filenames.update((".terraform.lock.hcl", os.path.join(".terraform", "modules", "modules.json")))
+        if state is not None:
+            # Files that disappeared since the last run
+            filenames.update(state["snapshot"])
+        return sorted(filenames)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    """JSON API of the verifier service: POST /verify {"path": ...} and GET /cohort[?wait=1]."""
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != "/cohort":
+            return self._send(404, {"error": f"unknown endpoint {url.path}"})
+        wait = parse_qs(url.query).get("wait") == ["1"]
+        self._send(200, self.server.service.cohort(wait=wait))
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/verify":
+            return self._send(404, {"error": f"unknown endpoint {url.path}"})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        except ValueError:
+            body = None
+        if not isinstance(body, dict) or not isinstance(body.get("path"), str):
+            return self._send(400, {"error": 'expected a JSON object like {"path": "<trainee directory>"}'})
+        path = body["path"]
+        try:
+            self._send(200, self.server.service.verify(path))
+        except FileNotFoundError as e:
+            self._send(404, {"error": str(e)})
+        except PermissionError as e:
+            self._send(403, {"error": str(e)})
+        except Exception as e:
+            self._send(500, {"error": str(e)})
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve(pattern, port, host="127.0.0.1", workers=None, **options):
+    """Run the verifier service until interrupted."""
+    service = VerifierService(pattern, workers=workers, **options)
+    server = ThreadingHTTPServer((host, port), _ServiceHandler)
+    server.service = service
+    print(f"\n{INFO} Serving {len(service.workspaces())} trainee directories on http://{host}:{server.server_port} (Ctrl+C to stop)...")
+    print(f"{INFO} POST /verify {{\"path\": \"<trainee directory>\"}} to verify one, GET /cohort for the whole class")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{INFO} Stopped serving")
+    finally:
+        server.server_close()
+        service.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Verify progress through the Terraform workshop exercises.")
+    parser.add_argument("directory", nargs="?", default=".", help="Terraform directory to verify (default: current directory)")
+    parser.add_argument("--batch", metavar="PATTERN", help="Verify every trainee directory below a root directory or matching a glob")
+    parser.add_argument("--workers", type=int, default=None, help="Number of parallel workers in batch and service mode (default: CPU count, at most 4 for the service)")
+    parser.add_argument("--summary-only", action="store_true", help="In batch mode, only print the cohort summary")
+    parser.add_argument("--serve", type=int, metavar="PORT", default=None, help="Run as a service with a JSON API on PORT for the trainee directories of --batch or the directory")
+    parser.add_argument("--host", default="127.0.0.1", help="Address the service listens on (default: 127.0.0.1)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help=f"Seconds before a terraform subprocess is killed (default: {DEFAULT_TIMEOUT})")
+    parser.add_argument("--rules", default=None, help=f"JSON file with the exercise rules (default: {DEFAULT_RULES_FILE.name} next to this script)")
+    parser.add_argument("--fix-format", action="store_true", help="Rewrite files with terraform fmt instead of only reporting formatting issues")
+    parser.add_argument("--watch", action="store_true", help="Keep running and re-verify the directory whenever a file is saved")
+    parser.add_argument("--no-cache", action="store_true", help="Always re-run every check and terraform command")
+    parser.add_argument("--format", choices=["text", "jsonl"], default="text", help="Report as human readable text or as one JSON record per line (default: text)")
+    parser.add_argument("--junit", metavar="PATH", default=None, help="Also write the results as JUnit XML to PATH")
+    parser.add_argument("--plugin-cache-dir", default=None, help="Directory of the provider plugins and inits shared by all workspaces (default: terraform below the cache directory)")
+    parser.add_argument("--offline", action="store_true", help="Only install providers from the plugin cache mirror, never download them")
+    parser.add_argument("--no-shared-init", action="store_true", help="Validate uninitialised workspaces in place instead of against a shared init")
+    parser.add_argument("--max-file-size", type=float, default=DEFAULT_MAX_FILE_BYTES / 1024 / 1024, metavar="MB",
+                        help=f"Skip workspace files larger than this (default: {DEFAULT_MAX_FILE_BYTES // 1024 // 1024})")
+    parser.add_argument("--profile", action="store_true", help="Print the wall and CPU time of every phase, check and terraform subprocess")
+    parser.add_argument("--trace", metavar="PATH", default=None, help="Write the timings as a Chrome trace-event JSON file to PATH")
+    parser.add_argument("--cache-dir", default=None, help=f"Directory of the result cache (default: {default_cache_dir()})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Main function to run the verification script."""
+    args = parse_args(argv)
+    options = {
+        "cache": None if args.no_cache else ResultCache(args.cache_dir),
+        "timeout": args.timeout,
+        "fix_format": args.fix_format,
+        "rules": args.rules,
+        "max_file_bytes": int(args.max_file_size * 1024 * 1024),
+        "plugin_cache": None if args.no_shared_init else PluginCache(
+            args.plugin_cache_dir or (Path(args.cache_dir) / "terraform" if args.cache_dir else None),
+            offline=args.offline,
+            timeout=args.timeout,
+        ),
+    }
+    text = args.format == "text"
+    try:
+        # Fail on a broken rules file before any workspace is verified
+        load_rules(args.rules or DEFAULT_RULES_FILE)
+    except (OSError, ValueError) as e:
+        print(f"{FAILURE} Cannot load the rules from {args.rules or DEFAULT_RULES_FILE}: {e}", file=sys.stdout if text else sys.stderr)
+        return 1
+    reporters = [TextReporter(batch=bool(args.batch), summary_only=args.summary_only) if text else JsonLinesReporter()]
+    if args.junit:
+        reporters.append(JUnitReporter(args.junit))
+    profiler = Profiler() if args.profile or args.trace else None
+
+    try:
+        if args.serve is not None:
+            serve(args.batch or args.directory, args.serve, host=args.host, workers=args.workers, **options)
+            return 0
+
+        if args.batch:
+            directories = discover_workspaces(args.batch)
+            if not directories:
+                print(f"{FAILURE} No trainee directories found for '{args.batch}'", file=sys.stdout if text else sys.stderr)
+                return 1
+            if text:
+                print(f"\n{INFO} Verifying {len(directories)} trainee directories...")
+            run_batch(directories, workers=args.workers, reporters=reporters, profiler=profiler, **options)
+            return 0
+
+        if args.watch:
+            watch(args.directory, reporters=reporters, profiler=profiler, **options)
+            return 0
+
+        if text:
+            print("\nTerraform Workshop Verifier")
+            print("=====================================================================================")
+            print("This script will verify your progress through the Terraform workshop exercises.")
+            print("It checks for the presence and correctness of various Terraform resources and configurations.")
+
+        # Create the verifier and run all checks
+        verifier = TerraformVerifier(args.directory, reporters=reporters, profiler=profiler, **options)
+        verifier.run_all_checks()
+        return 0
+    finally:
+        for reporter in reporters:
+            reporter.close()
+        if args.profile:
+            profiler.print_table(stream=sys.stdout if text else sys.stderr)
+        if args.trace:
+            profiler.write_trace(args.trace)
 
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())